@@ -1,6 +1,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import periodogram
+from rendering import show
+from spectral import periodogram
 
 # This code demonstrates the use of FFT to calculate the PSD of a simple
 # superposition of four sine waves. In addition the periodogram function from
@@ -32,7 +33,7 @@ ax4.plot(t, sin4)
 ax4.set_title('sin(30*2\u03C0t)')
 plt.tight_layout()
 plt.savefig('Figures/four_sine_waves.pdf', dpi=500, bbox_inches='tight')
-plt.show()
+show()
 
 # Plot of the superposition
 v_t = 1*sin1 + 0.5*sin2 + 0.1*sin3 + 0.2*sin4
@@ -46,16 +47,16 @@ plt.xlabel('t [s]')
 plt.ylabel('v(t) [V]')
 plt.savefig('Figures/superposition_of_sine_waves.pdf',
             dpi=500, bbox_inches='tight')
-plt.show()
+show()
 
 # Single-sided amplitude spectrum and PSD
 N = len(v_t)
-fft_ = np.fft.fft(v_t)  # compute the FFT
+fft_ = np.fft.rfft(v_t)  # compute the FFT (only positive frequencies)
 norm = abs(fft_)/N  # normalize the absolute value of FFT
 pos = norm[:N//2]  # using only the positive frequencies
 
 amplitude = 2*pos
-PSD = 2*(pos**2)*len(fft_)/fs
+PSD = 2*(pos**2)*N/fs
 
 # Plotting amplitude spectrum
 plt.figure()
@@ -65,7 +66,7 @@ plt.xlabel('frequency [Hz]')
 plt.ylabel('amplitude [V]')
 plt.savefig('Figures/amplitude_spectrum_sine_waves.pdf',
             dpi=500, bbox_inches='tight')
-plt.show()
+show()
 
 # Plotting PSD
 plt.figure()
@@ -75,7 +76,7 @@ plt.xlabel('frequency [Hz]')
 plt.ylabel('PSD [V$^2$/Hz]')
 plt.savefig('Figures/power_spectrum_sine_waves.pdf',
             dpi=500, bbox_inches='tight')
-plt.show()
+show()
 
 # PSD using periodogram
 f, pxx = periodogram(v_t, fs)
@@ -84,4 +85,4 @@ plt.plot(f[:35], pxx[:35])
 plt.xlabel('frequency [Hz]')
 plt.ylabel('PSD [V$^2$/Hz]')
 plt.title('Power spectrum density of\n'+t2+'\n using scipy.signal.periodogram')
-plt.show()
+show()
@@ -1,29 +1,45 @@
 import matplotlib.pyplot as plt
-from plot_psd_crcns import get_data_filenames, plot_psd_data
+from rendering import collect_lines, draw_lines, show
+from psd_store import open_store
+from plot_psd_crcns import plot_psd_data
 from plot_psd_others import psd_torbjorn, psd_gratiy, psd_from_miller2009, \
     psd_from_baranauskas2012, psd_from_jankowski2017
 
 # This file plots the chosen PSD of LFPs in color and the others in grayscale
+# All PSDs are loaded from the PSD store (see psd_store.py) in one call.
+
+log_bins = 300  # log-spaced frequency bins, None plots every frequency
+batch_lines = True  # draw the spectra as LineCollections (faster)
+rasterize = False  # rasterize dense spectra inside the vector PDF
 
 plt.rc('font', size=13)
 plt.figure(figsize=(12, 7))
-psd_torbjorn()
+if batch_lines:
+    collect_lines()
+store = open_store()
+if log_bins is None:
+    spectra = store.load(log=True)  # log10 of f and PSD, cropped
+else:  # log10 of f and mean, min and max PSD in log-spaced bins, cropped
+    spectra = store.load_binned(n_bins=log_bins)
+psd_torbjorn(spectrum=spectra['torbjorn'])
 # CRCNS data
-crcns_files = sorted(get_data_filenames(), reverse=True)
+crcns_files = sorted(store.select(dataset='crcns'), reverse=True)
 colors = ['grey', 'grey', 'darkgrey', 'darkgrey',
           'maroon', 'lightgrey', 'lightgrey', 'lightgrey',
           'darkkhaki', 'grey', 'grey', 'plum']
 abbr = ['A', 'B', 'A', 'B', 'A', 'B', 'C', 'D', 'A', 'B', 'C', 'D']
 for file, color, abb in zip(crcns_files, colors, abbr):
-    plot_psd_data(file, color, abb)
+    plot_psd_data(file, color, abb, spectrum=spectra[file])
 
 # other PSD/LFP data
-psd_gratiy()
-psd_from_miller2009(color='grey')
-psd_from_baranauskas2012()
-psd_from_jankowski2017(color='grey')
+psd_gratiy(spectrum=spectra['gratiy'])
+psd_from_miller2009(color='grey', spectrum=spectra['miller2009'])
+psd_from_baranauskas2012(spectrum=spectra['baranauskas2012'])
+psd_from_jankowski2017(color='grey', spectrum=spectra['jankowski2017'])
 
 plt.title('All PSDs of LFP data')
+if batch_lines:
+    draw_lines(rasterize_dense=rasterize)
 # axis labels and legend
 plt.xlabel('log$_{10}$(frequency) [Hz]')
 plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
@@ -31,4 +47,4 @@ plt.legend(bbox_to_anchor=(1.03, 1.0), loc="upper left")  # outside right
 
 plt.savefig('Figures/PSD_LFP_chosed.pdf', dpi=500, bbox_inches='tight')
 
-plt.show()
+show()  # only closes the figure when running headless
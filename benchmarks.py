@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import time
+import shutil
+import runpy
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+import numpy as np
+
+# This file contains benchmarks (time and peak memory) of the hot paths: the
+# diffusion potentials and their PSDs (one instance per case and batched),
+# the potentials of 10^5 mixtures of K, Na and Cl, and of six ions,
+# the PSDs of the CRCNS data (the per-channel periodogram loop and the batched
+# mean periodogram), the loading of Torbjørn's and Gratiy's LFP data, the
+# loading of the PSD files plotted in main_psd_plot.py and the rendering of
+# the figures. The raw LFP data is not in this repository, so LFP data with
+# the same shapes is made by synthetic_lfp and written to a temporary
+# directory, where the cases are run (so nothing in the repository is
+# changed). Every run is added to Benchmarks/results.jsonl together with the
+# commit and the machine, and the times are compared to the last run on the
+# same machine, e.g.
+# python benchmarks.py                 (all cases)
+# python benchmarks.py diffpot crcns   (the cases starting with these names)
+
+_repository = os.path.dirname(os.path.abspath(__file__))
+results_file = os.path.join(_repository, 'Benchmarks', 'results.jsonl')
+
+# shapes (channels, samples) and sampling frequencies of the LFP data:
+# Torbjørn's data before removing channels, Gratiy's trial averaged data and
+# a CRCNS hc2 recording of two minutes
+lfp_shapes = {'torbjorn': ((32, 2000 * 300 + 1), 2000),
+              'gratiy': ((80, 2500 * 3), 2500),
+              'crcns': ((32, 1250 * 120), 1250)}
+
+# the diffusion potentials: number of cases, delta_t and t_end as in
+# diffpot_and_psd.py
+n_potentials = 50
+# number of cases in the mixture sweeps, K, Na and Cl with and without Ca, Mg
+# and HCO3
+n_mixtures = 10**5
+potential_delta_t = 0.01
+potential_t_end = 100
+
+
+def synthetic_lfp(shape, fs, seed=0, dtype=np.float64):
+    """
+    LFP-like data, channel x time: white noise shaped to a 1/f PSD, with a
+    60 Hz line and a different amplitude on each channel, in mV.
+
+    :param shape: [tuple] (channels, samples)
+    :param fs: [float] sampling frequency
+    :param seed: [int] seed of the random numbers
+
+    :return: lfp: [array] the data
+    """
+    rng = np.random.default_rng(seed)
+    n_channels, n_samples = shape
+    lfp = np.empty(shape, dtype=dtype)
+    f = np.fft.rfftfreq(n_samples, 1 / fs)
+    scale = 1 / np.sqrt(np.maximum(f, f[1]))  # amplitude of a 1/f PSD
+    t = np.arange(n_samples) / fs
+    for channel in range(n_channels):  # one channel at a time, less memory
+        spectrum = np.fft.rfft(rng.standard_normal(n_samples)) * scale
+        trace = np.fft.irfft(spectrum, n=n_samples)
+        trace *= 0.1 * (1 + rng.random()) / trace.std()
+        trace += 0.01 * np.sin(2 * np.pi * 60 * t)
+        lfp[channel] = trace
+    return lfp
+
+
+def measure(function, repeat=3):
+    """
+    Best time of repeat calls of function, and the peak memory allocated
+    during one more call (traced with tracemalloc, which slows it down).
+
+    :return: seconds: [float] best time in seconds
+             peak: [int] peak traced memory in bytes
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+@contextlib.contextmanager
+def working_directory(directory):
+    """Running the code in the with-block in directory."""
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+# ================================= cases =====================================
+# Each case is a function which prepares what is needed in the (temporary)
+# working directory and returns the function which is measured.
+
+def _potentials():
+    from scenario import scenario1
+    return [scenario1(k=k) for k in np.linspace(1, 10, n_potentials)]
+
+
+def case_diffpot_per_instance():
+    from diffusionpotential import DiffusionPotential, shared_grids
+    concentrations = _potentials()
+
+    def run():
+        shared_grids.clear()
+        for index, conc in enumerate(concentrations):
+            model = DiffusionPotential(conc=conc, tau=10,
+                                       delta_t=potential_delta_t,
+                                       t_end=potential_t_end,
+                                       name=str(index))
+            model.calculate_everything()
+            # exp_decay and psd are only scaled when they are used
+            model.exp_decay, model.psd
+    return run
+
+
+def case_diffpot_batched():
+    from diffusionpotential_batch import DiffusionPotentialBatch
+    from scenario import scenario1_array
+    c = scenario1_array(k=np.linspace(1, 10, n_potentials))
+
+    def run():
+        DiffusionPotentialBatch.from_tensor(
+            c, 10, potential_delta_t, potential_t_end).calculate_everything()
+    return run
+
+
+def _mixture_case(other_ions):
+    from diffusionpotential_batch import DiffusionPotentialBatch
+    from scenario import scenario1_array, add_ions, ions
+    k = np.linspace(0.1, 10, n_mixtures)
+    c = scenario1_array(k=k)
+    if other_ions:
+        c, ions = add_ions(c, base={'Ca': 1.2, 'Mg': 1.0, 'HCO3': 26.0},
+                           change={'Ca': -0.1 * k})
+    batch = DiffusionPotentialBatch.from_tensor(
+        c, 10, potential_delta_t, potential_t_end, ions=ions)
+    return batch.potentials
+
+
+def case_mixture_k_na_cl():
+    return _mixture_case(other_ions=False)
+
+
+def case_mixture_six_ions():
+    return _mixture_case(other_ions=True)
+
+
+def _crcns_case(method):
+    from scipy.io import savemat
+    import psd_of_crcns_lfp_data
+
+    shape, fs = lfp_shapes['crcns']
+    os.makedirs('Data_LFP_crcns', exist_ok=True)
+    os.makedirs('Data_PSD_crcns', exist_ok=True)
+    file_name = 'hc2_benchmark.mat'
+    if not os.path.exists('Data_LFP_crcns/' + file_name):
+        savemat('Data_LFP_crcns/' + file_name,
+                {'volt_lfp': synthetic_lfp(shape, fs), 'fs': fs})
+
+    def run():
+        psd_of_crcns_lfp_data.load_data_calculate_psd_and_save(
+            file_name, 'volt_lfp', 'fs', method=method)
+    return run
+
+
+def case_crcns_per_channel_loop():
+    return _crcns_case('periodogram')
+
+
+def case_crcns_batched():
+    return _crcns_case('batched')
+
+
+def case_torbjorn_loader():
+    import psd_torbjorn_and_gratiy
+
+    shape, fs = lfp_shapes['torbjorn']
+    os.makedirs('Data_LFP_other', exist_ok=True)
+    os.makedirs('Data_PSD_other', exist_ok=True)
+    if not os.path.exists('Data_LFP_other/lfp_run26.npy'):
+        np.save('Data_LFP_other/lfp_run26.npy', synthetic_lfp(shape, fs))
+    return psd_torbjorn_and_gratiy.calculate_and_save_psd_torbjorn
+
+
+def case_gratiy_loader():
+    import h5py
+    import psd_torbjorn_and_gratiy
+
+    shape, fs = lfp_shapes['gratiy']
+    os.makedirs('Data_LFP_other', exist_ok=True)
+    os.makedirs('Data_PSD_other', exist_ok=True)
+    path = 'Data_LFP_other/mouse_1_lfp_trial_avg_3sec.h5'
+    if not os.path.exists(path):
+        with h5py.File(path, 'w') as file:
+            file['lfp_off_flash'] = synthetic_lfp(shape, fs)
+    return psd_torbjorn_and_gratiy.calculate_and_save_psd_of_lfp_gratiy
+
+
+def _copy_psd_files():
+    """Copies of the PSD files plotted in the main figures."""
+    for directory in ('Data_PSD_crcns', 'Data_PSD_other'):
+        if not os.path.exists(os.path.join(directory, '.copied')):
+            shutil.copytree(os.path.join(_repository, directory), directory,
+                            dirs_exist_ok=True)
+            open(os.path.join(directory, '.copied'), 'w').close()
+
+
+def case_psd_files_loading():
+    import psd_store
+    _copy_psd_files()
+    return psd_store.read_sources
+
+
+def case_psd_store_loading():
+    import psd_store
+    _copy_psd_files()
+    psd_store.open_store()  # built here, not measured
+
+    def run():
+        store = psd_store.PSDStore()
+        # loaded as arrays, the memory-mapped views are not read before
+        # they are used
+        for f, psd in store.load(log=True).values():
+            np.asarray(f) + np.asarray(psd)
+    return run
+
+
+def case_psd_store_binned():
+    import psd_store
+    _copy_psd_files()
+    psd_store.open_store()
+
+    def run():
+        psd_store.PSDStore().load_binned(n_bins=300)
+    return run
+
+
+def case_main_figure_rendering():
+    import matplotlib.pyplot as plt
+    _copy_psd_files()
+    os.makedirs('Figures', exist_ok=True)
+    import psd_store
+    psd_store.open_store()
+    script = os.path.join(_repository, 'main_psd_plot.py')
+
+    def run():
+        with contextlib.redirect_stdout(None):
+            runpy.run_path(script, run_name='__main__')
+        plt.close('all')
+    return run
+
+
+def case_dense_line_rendering():
+    import io
+    import matplotlib.pyplot as plt
+    import rendering
+    rng = np.random.default_rng(0)
+    x = np.log10(np.arange(1, 50001))
+    lines = [-2 * x + rng.standard_normal(len(x)) for _ in range(10)]
+
+    def run():
+        plt.figure()
+        with rendering.batched_lines():
+            for index, y in enumerate(lines):
+                rendering.plot_line(x, y, label=str(index))
+        plt.legend()
+        plt.savefig(io.BytesIO(), format='pdf')
+        plt.close('all')
+    return run
+
+
+cases = {'diffpot per instance': case_diffpot_per_instance,
+         'diffpot batched': case_diffpot_batched,
+         'mixture K, Na, Cl': case_mixture_k_na_cl,
+         'mixture six ions': case_mixture_six_ions,
+         'crcns per-channel loop': case_crcns_per_channel_loop,
+         'crcns batched': case_crcns_batched,
+         'torbjorn loader': case_torbjorn_loader,
+         'gratiy loader': case_gratiy_loader,
+         'psd files loading': case_psd_files_loading,
+         'psd store loading': case_psd_store_loading,
+         'psd store binned': case_psd_store_binned,
+         'main figure rendering': case_main_figure_rendering,
+         'dense line rendering': case_dense_line_rendering}
+
+
+# ================================ results ====================================
+
+def _commit():
+    """The commit of the repository, or None."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=_repository, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path=results_file):
+    """All stored runs, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_result(result, path=results_file):
+    """Adding a run to the stored runs."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+def previous_times(machine, path=results_file):
+    """The latest stored time of each case on machine, by case name."""
+    times = {}
+    for result in load_results(path):
+        if result['machine'] == machine:
+            times.update({name: case['seconds']
+                          for name, case in result['cases'].items()})
+    return times
+
+
+def run_benchmarks(names=None, repeat=3, save=True):
+    """
+    Running the cases in a temporary directory, printing the time, the peak
+    memory and the change of the time since the last run on this machine.
+
+    :param names: [sequence or None] names or beginnings of names of the
+                  cases, None runs all
+    :param repeat: [int] number of timed calls of each case
+    :param save: [bool] add the run to results_file
+
+    :return: result: [dict] the run
+    """
+    selected = [name for name in cases
+                if names is None or any(name.startswith(prefix)
+                                        for prefix in names)]
+    machine = platform.node()
+    previous = previous_times(machine)
+    result = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'commit': _commit(), 'machine': machine,
+              'python': platform.python_version(),
+              'numpy': np.__version__, 'repeat': repeat, 'cases': {}}
+
+    os.environ['HEADLESS'] = '1'  # before rendering.py is imported
+    sys.path.insert(0, _repository)
+    with tempfile.TemporaryDirectory() as directory, \
+            working_directory(directory):
+        print(f'{"case":26s} {"time":>10s} {"peak memory":>12s} '
+              f'{"change":>8s}')
+        for name in selected:
+            try:
+                seconds, peak = measure(cases[name](), repeat)
+            except ImportError as error:
+                print(f'{name:26s}   skipped: {error}')
+                continue
+            result['cases'][name] = {'seconds': seconds, 'peak_bytes': peak}
+            change = ''
+            if name in previous:
+                change = f'{seconds / previous[name] - 1:+7.0%}'
+            print(f'{name:26s} {seconds * 1000:8.1f} ms '
+                  f'{peak / 2**20:9.1f} MB {change:>8s}')
+
+    if save:
+        save_result(result)
+    return result
+
+
+if __name__ == '__main__':
+    run_benchmarks(sys.argv[1:] or None)
@@ -0,0 +1,138 @@
+import csv
+import numpy as np
+from scenario import ions, scenario_arrays
+from diffusionpotential_batch import DiffusionPotentialBatch
+
+# This file reads the catalog of cases from the literature (case_catalog.csv),
+# which were written out one by one in diffpot_and_psd.py ('normal' cases,
+# scenario 1) and SD_diffpot_and_psd.py ('pathological' cases, scenario 4).
+# Each row holds the source, figure, category, scenario, the changes in K and
+# Na, the baseline concentrations and tau of one case. New cases are added as
+# new rows (or in other .csv files with the same columns, which are read
+# together with the catalog). The whole catalog (or a part of it) is compiled
+# into one DiffusionPotentialBatch: the concentrations of all cases with the
+# same scenario are made with one call of the array scenario function, and
+# the potentials, exponential decays and PSDs of all cases are calculated in
+# one vectorized pass, e.g.
+# batch = run_catalog(category='pathological')
+
+catalog_file = 'case_catalog.csv'
+
+# fields of the table returned by read_catalog, concentrations in mM and tau
+# in seconds
+case_dtype = [('name', 'U64'), ('source', 'U64'), ('figure', 'U16'),
+              ('category', 'U16'), ('scenario', 'U16'), ('delta_k', float),
+              ('delta_na', float), ('kbase', float), ('nabase', float),
+              ('tau', float), ('note', 'U128')]
+
+
+def read_catalog(path=catalog_file, category=None):
+    """
+    Reading the cases.
+
+    :param path: [str or sequence] .csv file(s) with the columns of
+                 case_dtype (note, figure and delta_na may be left out)
+    :param category: [str or None] only the cases in this category (e.g.
+                     'normal' or 'pathological'), None reads all
+
+    :return: cases: [structured array] one row per case, see case_dtype
+    """
+    paths = [path] if isinstance(path, str) else list(path)
+    rows = []
+    for file_name in paths:
+        with open(file_name, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                if category is not None and row['category'] != category:
+                    continue
+                rows.append(tuple(
+                    float(row.get(field) or 0) if kind is float
+                    else row.get(field) or '' for field, kind in case_dtype))
+    cases = np.array(rows, dtype=case_dtype)
+    unknown = set(cases['scenario']) - set(scenario_arrays)
+    if unknown:
+        raise ValueError(f'unknown scenario(s) in the catalog: '
+                         f'{", ".join(sorted(unknown))}')
+    return cases
+
+
+def labels(cases):
+    """The label of each case, its name and tau, as used in the figures."""
+    return [f'{name}, $\u03C4$={tau:g}'
+            for name, tau in zip(cases['name'], cases['tau'])]
+
+
+def concentrations(cases):
+    """
+    The initial concentrations of all cases, with one call of the array
+    scenario function per scenario.
+
+    :param cases: [structured array] cases from read_catalog
+
+    :return: c: [array] concentrations, shape (cases, ions, 2), in the order
+                of cases
+    """
+    c = np.empty(shape=(len(cases), len(ions), 2))
+    for scenario in np.unique(cases['scenario']):
+        index = np.flatnonzero(cases['scenario'] == scenario)
+        part = cases[index]
+        kwargs = {'k': part['delta_k'], 'kbase': part['kbase'],
+                  'nabase': part['nabase']}
+        if np.any(part['delta_na'] != 0):  # only scenario 1 and 4 take na
+            kwargs['na'] = part['delta_na']
+        c[index] = scenario_arrays[scenario](**kwargs)
+    return c
+
+
+def compile_catalog(cases, delta_t=0.01, t_end=100, temp=310):
+    """
+    Making one batch of all cases.
+
+    :param cases: [structured array] cases from read_catalog
+    :param delta_t: [float] time step
+    :param t_end: [float] end time of the decays
+    :param temp: [float or array] temperature(s) in K
+
+    :return: batch: [DiffusionPotentialBatch] the cases, named by labels
+    """
+    return DiffusionPotentialBatch.from_tensor(
+        concentrations(cases), tau=cases['tau'], delta_t=delta_t,
+        t_end=t_end, temp=temp, names=labels(cases))
+
+
+def run_catalog(cases=None, category=None, delta_t=0.01, t_end=100,
+                temp=310, goldman=False, henderson=True, analytic_psd=False):
+    """
+    Calculating the potentials, exponential decays and PSDs of the cases in
+    one batch. By default the decays start from the potential of the
+    Henderson equation, as in diffpot_and_psd.py. With analytic_psd=True
+    the decays are not built, so thousands of cases fit in memory.
+
+    :param cases: [structured array or None] cases, None reads the catalog
+    :param category: [str or None] category read when cases is None
+
+    :return: batch: [DiffusionPotentialBatch] with exp_decay (cases, time),
+                    t, psd (cases, frequencies) and f calculated
+    """
+    if cases is None:
+        cases = read_catalog(category=category)
+    batch = compile_catalog(cases, delta_t=delta_t, t_end=t_end, temp=temp)
+    batch.calculate_everything(goldman=goldman, henderson=henderson,
+                               analytic_psd=analytic_psd)
+    return batch
+
+
+def print_table(cases, batch):
+    """Printing the cases and their potentials from run_catalog."""
+    print(f'{"name":18s} {"category":12s} {"scenario":9s} {"delta_K":>7s} '
+          f'{"tau":>6s} {"goldman":>8s} {"henderson":>9s} {"sigma":>8s}')
+    for row, goldman, henderson, delta_phi in zip(
+            cases, batch.goldman, batch.henderson, batch.delta_phi):
+        print(f'{row["name"]:18s} {row["category"]:12s} '
+              f'{row["scenario"]:9s} {row["delta_k"]:7.2f} '
+              f'{row["tau"]:6.2f} {goldman:8.3f} {henderson:9.3f} '
+              f'{delta_phi:8.3f}')
+
+
+if __name__ == '__main__':
+    catalog = read_catalog()
+    print_table(catalog, run_catalog(catalog, analytic_psd=True))
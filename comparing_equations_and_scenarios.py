@@ -1,9 +1,9 @@
 from diffusionpotential import DiffusionPotential
-from diffpot_and_psd import scenario1
-from scenario import scenario2, scenario3
-from SD_diffpot_and_psd import scenario4
+from result_cache import calculate_everything_cached
+from scenario import scenario1, scenario2, scenario3, scenario4
 import numpy as np
 import matplotlib.pyplot as plt
+from rendering import show
 
 # Calculating the potential with the Goldman equation, the Henderson equation
 # and the approximated sigma equation (for scenario 1-4)
@@ -26,7 +26,7 @@ for scen, number in zip(scenario_functions, ["1", "2", "3", "4"]):
         c = scen(k=k, kbase=3.0, nabase=149.0)
         model = DiffusionPotential(conc=c, tau=5, delta_t=0.01, t_end=100,
                                    name='K+ = +'+str(k))
-        model.calculate_everything(henderson=True)
+        calculate_everything_cached(model, henderson=True)
 
         # Add potential estimates to table
         table[0, index] = k
@@ -62,7 +62,7 @@ else:
     plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
     plt.savefig('Figures/PSD_comparing_scenariosk2.pdf',
                 dpi=500, bbox_inches='tight')
-plt.show()
+show()
 
 potassium_SD = [20, 30, 40, 50]
 table = np.zeros(shape=(4, 4))
@@ -72,7 +72,7 @@ for index, k in enumerate(potassium_SD):
     c = scenario4(k=k, kbase=3.0, nabase=149.0)
     model = DiffusionPotential(conc=c, tau=5, delta_t=0.01, t_end=100,
                                name='K+ = +'+str(k))
-    model.calculate_everything()
+    calculate_everything_cached(model)
 
     table[0, index] = k
     table[1, index] = model.goldman
@@ -88,4 +88,4 @@ plt.title('PSD - Scenario 4, $\u03C4$=5 s')
 plt.xlabel('log$_{10}$(frequency) [Hz]')
 plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
 plt.legend()
-plt.show()
+show()
@@ -0,0 +1,310 @@
+import numpy as np
+from diffusionpotential import DiffusionPotential
+
+# This file fits exponential decays c(t) = baseline + delta_c*exp(-(t-t0)/tau)
+# (for t >= t0) to the concentration traces digitized from figures (the .csv
+# files in Recreating_figures), instead of choosing tau by eye. All traces are
+# fitted at once: they are padded to the same length (the padding is masked
+# out), a grid search over tau (where baseline and delta_c are found by linear
+# least squares) gives the starting values, and Gauss-Newton steps for
+# (baseline, delta_c, tau) of all traces refine them. The standard errors come
+# from the covariance of the least squares fit. The fitted baseline, delta_c
+# and tau can be given directly to DiffusionPotential, see
+# diffusion_potential.
+
+# the traces: file, time column, concentration column, ion, time unit (in
+# seconds), start of the decay t0 (in the time unit of the file, None uses the
+# end of the peak, see read_traces) and a shift of the concentrations (the
+# baseline of K+ in Kraig 1978, see kraio1978_fig8.py)
+traces = {
+    'HajYasein2015_fig2a': ('Recreating_figures/data_HajYasein2015_fig2ab.csv',
+                            'X', 'Y', 'K', 1, 9.767, 0),
+    'HajYasein2015_fig2b': ('Recreating_figures/data_HajYasein2015_fig2ab.csv',
+                            'X.1', 'Y.1', 'K', 1, 9.95, 0),
+    'kraig1978_fig8_Cl': ('Recreating_figures/data_kraig1978_fig8.csv',
+                          'X', 'Y', 'Cl', 60, None, 0),
+    'kraig1978_fig8_Na': ('Recreating_figures/data_kraig1978_fig8.csv',
+                          'X.1', 'Y.1', 'Na', 60, None, 0),
+    'kraig1978_fig8_K': ('Recreating_figures/data_kraig1978_fig8.csv',
+                         'X.2', 'Y.2', 'K', 60, None, 2.3)}
+
+# fields of the table returned by fit_traces, times in seconds and
+# concentrations in mM
+fit_dtype = [('name', 'U64'), ('ion', 'U8'), ('t0', float),
+             ('baseline', float), ('delta_c', float), ('tau', float),
+             ('baseline_err', float), ('delta_c_err', float),
+             ('tau_err', float), ('rms', float), ('n_points', int)]
+
+
+def read_traces(names=None, peak_fraction=0.9):
+    """
+    Reading the traces from the .csv files, sorted by time.
+
+    :param names: [sequence or None] names of the traces (keys of traces),
+                  None reads all
+    :param peak_fraction: [float] the decay of a trace without t0 starts at
+                          the end of its peak, the last time the change from
+                          the first value is at least this fraction of the
+                          largest change
+
+    :return: read: [dict] (t, c, ion, t0) of each trace by name, with t and
+                   t0 in seconds
+    """
+    import pandas as pd  # only needed when the files are read
+
+    if names is None:
+        names = list(traces)
+    data = {}
+    read = {}
+    for name in names:
+        path, t_column, c_column, ion, unit, t0, shift = traces[name]
+        if path not in data:
+            data[path] = pd.read_csv(path, header=1)
+        t = data[path][t_column].values
+        c = data[path][c_column].values + shift
+        keep = ~(np.isnan(t) | np.isnan(c))
+        order = np.argsort(t[keep])
+        t = t[keep][order] * unit
+        c = c[keep][order]
+        if t0 is None:
+            # the last time the change from the first value is at least
+            # peak_fraction of the largest change
+            change = np.abs(c - c[0])
+            t0 = t[np.flatnonzero(change >= peak_fraction *
+                                  change.max())[-1]]
+        else:
+            t0 = t0 * unit
+        read[name] = (t, c, ion, t0)
+    return read
+
+
+def _linear_fit(decay, c, mask):
+    """
+    Baseline and delta_c minimizing the sum of squares of
+    c - baseline - delta_c*decay over the points in mask, along the last
+    axis. Returns baseline, delta_c and the sum of squares.
+    """
+    n = np.sum(mask, axis=-1)
+    mean_e = np.sum(decay * mask, axis=-1) / n
+    mean_c = np.sum(c * mask, axis=-1) / n
+    de = (decay - mean_e[..., np.newaxis]) * mask
+    dc = (c - mean_c[..., np.newaxis]) * mask
+    delta_c = np.sum(de * dc, axis=-1) / np.sum(de * de, axis=-1)
+    baseline = mean_c - delta_c * mean_e
+    residual = (c - baseline[..., np.newaxis] -
+                delta_c[..., np.newaxis] * decay) * mask
+    return baseline, delta_c, np.sum(residual**2, axis=-1)
+
+
+def _model(params, s):
+    """The decay and the model of each trace for params (baseline, delta_c,
+    tau) with shape (traces, 3) and s = t - t0 with shape (traces, points)."""
+    decay = np.exp(-s / params[:, 2:3])
+    return decay, params[:, 0:1] + params[:, 1:2] * decay
+
+
+def fit_decays(t, c, t0, mask=None, n_tau=200, max_iterations=50,
+               tolerance=1e-10):
+    """
+    Fitting c = baseline + delta_c*exp(-(t-t0)/tau) to each trace (row) at
+    once, using the points with t >= t0.
+
+    :param t: [array] times, shape (traces, points)
+    :param c: [array] concentrations, shape (traces, points)
+    :param t0: [array] start of the decay of each trace
+    :param mask: [array or None] points which can be used (e.g. not the
+                 padding), None uses all finite points
+    :param n_tau: [int] number of tau in the grid search, log-spaced from
+                  1/1000 to 10 times the length of each fitted trace
+    :param max_iterations: [int] max number of Gauss-Newton steps
+    :param tolerance: [float] the steps stop when the relative change of the
+                      sum of squares of all traces is smaller
+
+    :return: params: [array] baseline, delta_c and tau of each trace, shape
+                     (traces, 3)
+             errors: [array] standard errors of params
+             rms: [array] root mean square of the residuals of each trace
+             n_points: [array] number of points used for each trace
+    """
+    t = np.atleast_2d(np.asarray(t, dtype=float))
+    c = np.atleast_2d(np.asarray(c, dtype=float))
+    t0 = np.atleast_1d(np.asarray(t0, dtype=float))
+    if mask is None:
+        mask = np.isfinite(t) & np.isfinite(c)
+    s = t - t0[:, np.newaxis]
+    mask = mask & (s >= 0)
+    # masked points get the value 0, so that nan does not spread
+    s = np.where(mask, s, 0)
+    c = np.where(mask, c, 0)
+    n_points = mask.sum(axis=-1)
+
+    # grid search, shape (traces, n_tau, points)
+    length = s.max(axis=-1)
+    tau_grid = length[:, np.newaxis] * np.logspace(-3, 1, n_tau)
+    decay = np.exp(-s[:, np.newaxis, :] / tau_grid[:, :, np.newaxis])
+    baseline, delta_c, rss = _linear_fit(decay, c[:, np.newaxis, :],
+                                         mask[:, np.newaxis, :])
+    best = np.argmin(rss, axis=-1)
+    rows = np.arange(len(t))
+    params = np.stack([baseline[rows, best], delta_c[rows, best],
+                       tau_grid[rows, best]], axis=-1)
+
+    # Gauss-Newton steps, halving a step where it does not lower the sum of
+    # squares of the trace
+    def residuals_and_jacobian(params):
+        decay, model = _model(params, s)
+        jacobian = np.stack([np.ones_like(s), decay,
+                             params[:, 1:2] * decay * s / params[:, 2:3]**2],
+                            axis=-1) * mask[..., np.newaxis]
+        return (c - model) * mask, jacobian
+
+    residuals, jacobian = residuals_and_jacobian(params)
+    rss = np.sum(residuals**2, axis=-1)
+    for _ in range(max_iterations):
+        jtj = np.einsum('tpi,tpj->tij', jacobian, jacobian)
+        jtr = np.einsum('tpi,tp->ti', jacobian, residuals)
+        step = np.linalg.solve(jtj, jtr[..., np.newaxis])[..., 0]
+        new_params = params + step
+        for _ in range(20):
+            bad = ~(new_params[:, 2] > 0)
+            new_residuals = (c - _model(np.where(bad[:, np.newaxis], params,
+                                                 new_params), s)[1]) * mask
+            new_rss = np.sum(new_residuals**2, axis=-1)
+            bad |= new_rss > rss
+            if not bad.any():
+                break
+            step[bad] /= 2
+            new_params = params + step
+        else:
+            new_params = np.where(bad[:, np.newaxis], params, new_params)
+        params = new_params
+        residuals, jacobian = residuals_and_jacobian(params)
+        new_rss = np.sum(residuals**2, axis=-1)
+        converged = abs(rss.sum() - new_rss.sum()) <= tolerance * rss.sum()
+        rss = new_rss
+        if converged:
+            break
+
+    # covariance s^2 (J^T J)^-1 of the parameters
+    jtj = np.einsum('tpi,tpj->tij', jacobian, jacobian)
+    variance = rss / np.maximum(n_points - 3, 1)
+    covariance = np.linalg.inv(jtj) * variance[:, np.newaxis, np.newaxis]
+    errors = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+    return params, errors, np.sqrt(rss / n_points), n_points
+
+
+def fit_traces(names=None, **kwargs):
+    """
+    Fitting the decays of the traces (see fit_decays) in one batch.
+
+    :param names: [sequence or None] names of the traces (keys of traces),
+                  None fits all
+    :param kwargs: passed to fit_decays
+
+    :return: table: [structured array] one row per trace, see fit_dtype
+    """
+    read = read_traces(names)
+    n_max = max(len(t) for t, _, _, _ in read.values())
+    t = np.full((len(read), n_max), np.nan)
+    c = np.full((len(read), n_max), np.nan)
+    for row, (t_trace, c_trace, _, _) in enumerate(read.values()):
+        t[row, :len(t_trace)] = t_trace
+        c[row, :len(c_trace)] = c_trace
+    t0 = np.array([trace[3] for trace in read.values()])
+    params, errors, rms, n_points = fit_decays(t, c, t0, **kwargs)
+
+    table = np.zeros(len(read), dtype=fit_dtype)
+    table['name'] = list(read)
+    table['ion'] = [trace[2] for trace in read.values()]
+    table['t0'] = t0
+    for index, field in enumerate(('baseline', 'delta_c', 'tau')):
+        table[field] = params[:, index]
+        table[field + '_err'] = errors[:, index]
+    table['rms'] = rms
+    table['n_points'] = n_points
+    return table
+
+
+def diffusion_potential(rows, delta_t=0.01, t_end=100, name=None,
+                        scenario=None, sigma=0.0, temp=310):
+    """
+    Making a DiffusionPotential from fitted traces.
+
+    :param rows: [structured array] rows of the table from fit_traces, one
+                 per ion. The ions decay with their own tau (trajectory mode
+                 of DiffusionPotential)
+    :param name: [str or None] name of the potential, None uses the name of
+                 the first row
+    :param scenario: [function or None] e.g. scenario.scenario1, which gives
+                     the other ions from the change in K (one K row), and
+                     then tau is the tau of K
+    :param sigma: [float] number of standard errors added to delta_c and tau,
+                  e.g. -1 and 1 for the potentials at the ends of the error
+                  bars
+
+    :return: model: [DiffusionPotential]
+    """
+    rows = np.atleast_1d(rows)
+    if name is None:
+        name = rows['name'][0]
+    delta_c = rows['delta_c'] + sigma * rows['delta_c_err']
+    tau = rows['tau'] + sigma * rows['tau_err']
+    if scenario is not None:
+        conc = scenario(k=float(delta_c[0]), kbase=float(rows['baseline'][0]))
+        tau = float(tau[0])
+    else:
+        conc = {ion: [float(base), float(base + change)]
+                for ion, base, change in zip(rows['ion'], rows['baseline'],
+                                             delta_c)}
+        tau = {ion: float(value) for ion, value in zip(rows['ion'], tau)}
+    return DiffusionPotential(conc=conc, tau=tau, delta_t=delta_t,
+                              t_end=t_end, name=name, temp=temp)
+
+
+def print_table(table):
+    """Printing a table from fit_traces."""
+    print(f'{"name":22s} {"ion":4s} {"t0 [s]":>7s} {"baseline":>16s} '
+          f'{"delta_c [mM]":>16s} {"tau [s]":>16s} {"rms":>6s}')
+    for row in table:
+        print(f'{row["name"]:22s} {row["ion"]:4s} {row["t0"]:7.2f} '
+              f'{row["baseline"]:7.2f} ± {row["baseline_err"]:6.2f} '
+              f'{row["delta_c"]:7.2f} ± {row["delta_c_err"]:6.2f} '
+              f'{row["tau"]:7.2f} ± {row["tau_err"]:6.2f} '
+              f'{row["rms"]:6.2f}')
+
+
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+    from rendering import show
+    from scenario import scenario1
+
+    table = fit_traces()
+    print_table(table)
+
+    # the fitted traces
+    read = read_traces()
+    fig, axes = plt.subplots(1, len(table), figsize=(4 * len(table), 3.5))
+    for ax, row in zip(axes, table):
+        t, c, ion, t0 = read[row['name']]
+        time = np.linspace(t0, t[-1], num=200)
+        ax.plot(t, c, '.', label=f'{ion} data')
+        ax.plot(time, row['baseline'] + row['delta_c'] *
+                np.exp(-(time - t0) / row['tau']),
+                label=f'$τ$ = {row["tau"]:.2f} ± {row["tau_err"]:.2f} s')
+        ax.set_title(row['name'], fontsize=9)
+        ax.set_xlabel('time [s]')
+        ax.legend(fontsize=8)
+    axes[0].set_ylabel('concentration [mM]')
+    plt.tight_layout()
+    plt.savefig('Figures/decay_fits.pdf', dpi=500, bbox_inches='tight')
+    show()
+
+    # diffusion potentials from the fits
+    for name in ('HajYasein2015_fig2a', 'HajYasein2015_fig2b'):
+        model = diffusion_potential(table[table['name'] == name],
+                                    scenario=scenario1)
+        print(name, 'initial potential:', model.delta_phi, 'mV')
+    kraig = table[np.char.startswith(table['name'], 'kraig1978')]
+    model = diffusion_potential(kraig, name='kraig1978_fig8')
+    print('kraig1978_fig8', 'max |potential|:',
+          np.max(np.abs(model.exp_decay)), 'mV')
@@ -1,10 +1,18 @@
+from collections import OrderedDict
 import numpy as np
-from scipy.signal import periodogram
+import spectral
+from instrumentation import instrumented
 
 # This file contains two classes: Ion and DiffusionPotential.
 # Ion stores variables associated to a specified ion species.
+# DiffusionPotential keeps its ions in an ion table instead (a structured
+# array with one row per ion, see ion_table), so that the equations are array
+# reductions over the ions, and a model only holds one small array for all
+# its ions.
 # DiffusionPotential calculates and stores everything needed to calculate the
-# power spectrum density of a diffusion potential
+# power spectrum density of a diffusion potential, either for a potential
+# decaying exponentially from its initial value, or along a concentration
+# trajectory (see DiffusionPotential.conc_trajectory)
 
 # Constants
 R = 8.3144598  # gas constant, J / mol K
@@ -13,6 +21,8 @@ lambda_n = 1.6  # tortuosity
 
 
 class Ion:
+    __slots__ = ('c', 'D', 'z', 'name')
+
     def __init__(self, c, d, z, name):
         """
         The class stores variables for one ion species.
@@ -21,7 +31,7 @@ class Ion:
         :param z: valence of ion
         :param name: name of ion
         """
-        self.c = np.asarray(c, dtype=np.float)  # concentration
+        self.c = np.asarray(c, dtype=float)  # concentration
         self.D = d / (lambda_n ** 2)  # diffusion constant in ECS
         self.z = z  # valence
         self.name = name  # name of the ion
@@ -35,79 +45,681 @@ valence = {'K': +1, 'Na': +1, 'Cl': -1,
 diffcoeff = {'K': 1.96e-9, 'Na': 1.33e-9, 'Cl': 2.03e-9,
              'Ca': 0.71e-9, 'Mg': 0.72e-9, 'HCO3': 1.18e-9}
 
+# the same as arrays, looked up with the index of each ion in ion_index
+ion_index = {name: index for index, name in enumerate(valence)}
+valence_array = np.array([valence[name] for name in ion_index], dtype=float)
+diffcoeff_array = np.array([diffcoeff[name] for name in ion_index])
+
+# fields of an ion table: name, diffusion constant in ECS, valence, and the
+# base and peak (base +/- change) concentrations. Made once, since a dtype
+# made from a list for each table would take more memory than the table.
+ion_dtype = np.dtype([('name', 'U8'), ('D', float), ('z', float),
+                      ('c_base', float), ('c_peak', float)])
+
+
+def ion_indices(names):
+    """Indices of the ions in the lookup arrays (e.g. valence_array)."""
+    try:
+        return np.array([ion_index[name] for name in names], dtype=int)
+    except KeyError as error:
+        raise ValueError(f'unknown ion: {error.args[0]}') from None
+
+
+def ion_table(conc):
+    """
+    Making the ion table of a dict of concentrations.
+
+    :param conc: [dict] {'ion': [base, base+/-change]}, as returned by the
+                 scenario functions
+
+    :return: ions: [structured array] one row per ion, see ion_dtype
+    """
+    index = ion_indices(conc.keys())
+    ions = np.empty(len(index), dtype=ion_dtype)
+    ions['name'] = list(conc.keys())
+    ions['D'] = diffcoeff_array[index] / lambda_n**2
+    ions['z'] = valence_array[index]
+    c = np.array([conc[name] for name in conc], dtype=float).reshape(-1, 2)
+    ions['c_base'] = c[:, 0]
+    ions['c_peak'] = c[:, 1]
+    return ions
+
+
+def monovalent(z):
+    """Whether all ions are monovalent, needed by the Goldman equation."""
+    return bool(np.all(np.abs(z) == 1))
+
+
+def check_monovalent(z):
+    """Raises ValueError if the Goldman equation can not be used."""
+    if not monovalent(z):
+        raise ValueError('the Goldman equation is only valid for monovalent '
+                         'ions (K, Na, Cl, HCO3)')
+
+
+def ion_sums(d, z, c_base, c):
+    """
+    The sums over the ions used by the Goldman, Henderson and approximated
+    equations, for many sets of concentrations at once. All of them are
+    taken in one matrix product for c_base and one for c (the sums of the
+    changes c - c_base are the differences of these), so the concentrations
+    are only read once, and more ions (e.g. Ca, Mg and HCO3) only make these
+    two products a bit larger.
+
+    :param d: [array] diffusion constants, one per ion
+    :param z: [array] valences, one per ion
+    :param c_base: [array] baseline concentrations, shape (ions, sets) or
+                   (ions, 1)
+    :param c: [array] concentrations, shape (ions, sets)
+
+    :return: base_sums, sums: [arrays] the sums of D of the positive ions,
+             D of the negative ions, D*z and D*z**2, for c_base and for c
+    """
+    z = np.asarray(z, dtype=float)
+    positive = z > 0  # positive ion c = [base, max delta c]
+    weights = np.stack([d * positive, d * ~positive, d * z, d * z**2])
+    return weights @ c_base, weights @ c
+
+
+def _goldman_from_sums(base_sums, sums, temp):
+    base_positive, base_negative = base_sums[0], base_sums[1]
+    positive_sum, negative_sum = sums[0], sums[1]
+    return (R * temp / F) * np.log((base_positive + negative_sum) /
+                                   (positive_sum + base_negative)) * 1000
+
+
+def _henderson_from_sums(base_sums, sums, temp):
+    # weighted with D*z and D*z**2, for monovalent ions sign(z)*D and D
+    delta_z = sums[2] - base_sums[2]
+    delta_z2 = sums[3] - base_sums[3]
+    ratio = np.divide(delta_z, delta_z2, out=np.zeros(np.shape(delta_z)),
+                      where=delta_z2 != 0)
+    return (R * temp / F) * ratio * np.log(base_sums[3] / sums[3]) * 1000
+
+
+def _sigma_from_sums(base_sums, sums, temp):
+    average_sigma = (F**2 / (R * temp)) * (base_sums[3] + sums[3]) / 2
+    return (F / average_sigma) * (sums[3] - base_sums[3]) * 1000
+
+
+def goldman_potential(d, z, c_base, c, temp=310):
+    """
+    Goldman potential for many sets of concentrations at once, e.g. the cases
+    of a batch or the samples of a concentration trajectory. The sums over
+    ions are matrix products (see ion_sums), so there is no loop over the
+    sets.
+
+    :param d: [array] diffusion constants, one per ion
+    :param z: [array] valences, one per ion
+    :param c_base: [array] baseline concentrations, shape (ions, sets) or
+                   (ions, 1)
+    :param c: [array] concentrations, shape (ions, sets)
+    :param temp: [float or array] temperature(s), K
+
+    :return: [array] potential of each set, mV
+    """
+    check_monovalent(z)
+    return _goldman_from_sums(*ion_sums(d, z, c_base, c), temp)
+
+
+def henderson_potential(d, z, c_base, c, temp=310):
+    """
+    Henderson potential for many sets of concentrations at once, see
+    goldman_potential. Sets where no concentration has changed get the
+    potential 0 (the limit), not nan.
+    """
+    return _henderson_from_sums(*ion_sums(d, z, c_base, c), temp)
+
+
+def sigma_potential(d, z, c_base, c, temp=310):
+    """
+    Potential from the approximated equation with the average sigma for many
+    sets of concentrations at once, see goldman_potential.
+    """
+    return _sigma_from_sums(*ion_sums(d, z, c_base, c), temp)
+
+
+def all_potentials(d, z, c_base, c, temp=310):
+    """
+    The Goldman, Henderson and approximated potentials for many sets of
+    concentrations at once, see goldman_potential, from one pass over the
+    concentrations (see ion_sums). The Goldman potential is nan when some of
+    the ions are not monovalent.
+
+    :return: goldman, henderson, delta_phi: [arrays] potentials, mV
+    """
+    base_sums, sums = ion_sums(d, z, c_base, c)
+    if monovalent(z):
+        goldman = _goldman_from_sums(base_sums, sums, temp)
+    else:
+        goldman = np.full(np.shape(sums[0]), np.nan)
+    return goldman, _henderson_from_sums(base_sums, sums, temp), \
+        _sigma_from_sums(base_sums, sums, temp)
+
+
+def mixture_potentials(ions, c_base, c, temp=310):
+    """
+    The Goldman, Henderson and approximated potentials of any mixture of the
+    ions in valence and diffcoeff, with one row of concentrations per case.
+
+    :param ions: [sequence] ion names, one per column, e.g.
+                 ('K', 'Na', 'Cl', 'Ca', 'Mg', 'HCO3')
+    :param c_base: [array] baseline concentrations, shape (cases, ions) or
+                   (ions,) for the same baseline in all cases
+    :param c: [array] concentrations at max change, shape (cases, ions)
+    :param temp: [float or array] temperature(s), K
+
+    :return: goldman, henderson, delta_phi: [arrays] potential of each case,
+             mV (goldman is nan when some ions are not monovalent)
+    """
+    index = ion_indices(ions)
+    c_base = np.atleast_2d(np.asarray(c_base, dtype=float))
+    c = np.atleast_2d(np.asarray(c, dtype=float))
+    if c_base.shape[-1] != len(index) or c.shape[-1] != len(index):
+        raise ValueError('one column of concentrations is needed per ion')
+    # (ions, cases) views, no copies
+    return all_potentials(diffcoeff_array[index] / lambda_n**2,
+                          valence_array[index], c_base.T, c.T, temp)
+
+
+# the vectorized equations by name, see DiffusionPotential.equation
+potential_equations = {'goldman': goldman_potential,
+                       'henderson': henderson_potential,
+                       'sigma': sigma_potential}
+
+
+def psd_of_exponential_decay(amplitude, tau, delta_t, t_end):
+    """
+    Closed-form PSD of the sampled exponential decay
+    amplitude*exp(-t/tau), with t = np.linspace(0, t_end, int(t_end/delta_t))
+    as in DiffusionPotential.exponential_decay. The result equals
+    periodogram(amplitude*exp(-t/tau), 1/delta_t), i.e. with constant
+    detrending, a boxcar window and 'density' scaling, but the time series is
+    never built. The samples form a geometric sequence r**n, so the DFT is
+    X_k = A*(1 - r**N) / (1 - r*exp(-2*pi*i*k/N)).
+
+    :param amplitude: [float or array] amplitude(s) of the decay
+    :param tau: [float or array] time constant(s), broadcast with amplitude
+    :param delta_t: [float] time step
+    :param t_end: [float] end time
+
+    :return: f: [array] sample frequencies
+             psd: [array] PSD, shape broadcast(amplitude, tau) + f.shape
+    """
+    n_points = int(t_end / delta_t)
+    fs = 1 / delta_t
+    f = np.fft.rfftfreq(n_points, d=1 / fs)
+    amplitude = np.asarray(amplitude, dtype=float)[..., np.newaxis]
+    tau = np.asarray(tau, dtype=float)[..., np.newaxis]
+    # the spacing of np.linspace(0, t_end, n_points) is t_end/(n_points-1)
+    ratio = np.exp(-(t_end / (n_points - 1)) / tau)
+    theta = 2 * np.pi * np.arange(len(f)) / n_points
+    power = (amplitude * (1 - ratio**n_points))**2 / \
+        (1 - 2 * ratio * np.cos(theta) + ratio**2)
+    psd = power / (fs * n_points)
+    psd[..., 0] = 0  # the mean is removed by the detrending
+    # one-sided spectrum, the Nyquist frequency is not doubled
+    if n_points % 2 == 0:
+        psd[..., 1:-1] *= 2
+    else:
+        psd[..., 1:] *= 2
+    return f, psd
+
+
+class SharedGrids:
+    """
+    Registry of time grids, frequency grids, unit decays exp(-t/tau) and
+    their PSDs. Every array is calculated once per (delta_t, t_end) or
+    (tau, delta_t, t_end) and made read-only, so that all instances of
+    DiffusionPotential with the same parameters share the same array.
+    At most maxsize arrays are kept, the least recently used are removed
+    first (instances using them keep their own reference).
+    """
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.arrays = OrderedDict()
+
+    def _shared(self, key, calculate):
+        if key in self.arrays:
+            self.arrays.move_to_end(key)
+            return self.arrays[key]
+        array = calculate()
+        array.setflags(write=False)
+        self.arrays[key] = array
+        while len(self.arrays) > self.maxsize:
+            self.arrays.popitem(last=False)  # least recently used
+        return array
+
+    def time_grid(self, delta_t, t_end):
+        return self._shared(
+            ('t', delta_t, t_end),
+            lambda: np.linspace(0, t_end, num=int(t_end / delta_t)))
+
+    def frequency_grid(self, delta_t, t_end):
+        # the same frequencies as returned by periodogram
+        fs = 1 / delta_t
+        return self._shared(
+            ('f', delta_t, t_end),
+            lambda: np.fft.rfftfreq(int(t_end / delta_t), d=1 / fs))
+
+    def unit_decay(self, tau, delta_t, t_end):
+        return self._shared(
+            ('decay', tau, delta_t, t_end),
+            lambda: np.exp(-self.time_grid(delta_t, t_end) / tau))
+
+    def unit_psd(self, tau, delta_t, t_end, analytic=False):
+        if analytic:
+            return self._shared(
+                ('analytic psd', tau, delta_t, t_end),
+                lambda: psd_of_exponential_decay(1.0, tau, delta_t, t_end)[1])
+        fs = 1 / delta_t
+        return self._shared(
+            ('psd', tau, delta_t, t_end),
+            lambda: spectral.periodogram(
+                self.unit_decay(tau, delta_t, t_end), fs)[1])
+
+    def clear(self):
+        """Removing all arrays, e.g. after a sweep over many tau."""
+        self.arrays.clear()
+
+
+shared_grids = SharedGrids()
+
+# Quantities calculated by DiffusionPotential, grouped by what they depend on.
+# The initial potentials depend on the concentrations and the temperature, the
+# time and frequency arrays on delta_t and t_end, and the unit decay
+# exp(-t/tau) and its PSD on delta_t, t_end and tau. exp_decay and psd are the
+# unit decay and its PSD scaled by the initial potential. The grids and unit
+# decays are read-only arrays taken from shared_grids, and an instance only
+# keeps the scale (the absolute initial potential), so exp_decay and psd are
+# scaled each time they are used and never stored per instance, unless they
+# are set explicitly (e.g. from a cache). In trajectory mode exp_decay and psd
+# are the potential along the concentration trajectory and its PSD, which
+# depend on everything.
+potential_names = ('goldman', 'henderson', 'delta_phi')
+grid_names = ('t', 'f')
+decay_names = ('unit_decay', 'unit_psd')
+scaled_names = ('scale', 'exp_decay', 'psd', 'potential_trajectory',
+                'trajectory_psd')
+
+
+def equation_name(g=False, h=False):
+    """Name of the equation chosen with g and h, see exponential_decay."""
+    if g:
+        return 'goldman'
+    elif h:
+        return 'henderson'
+    return 'sigma'
+
 
 class DiffusionPotential:
-    def __init__(self, conc, tau, delta_t, t_end, name, temp=310):
+    def __init__(self, conc, tau, delta_t, t_end, name, temp=310,
+                 conc_trajectory=None):
         """
-        Initialize a class instance with attributes.
+        Initialize a class instance with attributes. Nothing is calculated
+        here, each quantity is calculated when it is first used and kept
+        until a parameter it depends on is changed.
         :param conc: dict with K, Na and Cl as keys
+        :param tau: time constant of the decay, or a dict with one time
+                    constant per ion (trajectory mode, the concentration of
+                    each ion decays from its max to its base value)
+        :param conc_trajectory: None, or a dict with concentration time
+                                series (one value per sample of t) for the
+                                ions (trajectory mode)
         """
-        self.T = temp  # temperature, K
+        self._cache = {}  # calculated quantities
+        self._T = temp  # temperature, K
         self.name = name
-        self.ion_list = [Ion(c=conc[ion], d=diffcoeff[ion],
-                             z=valence[ion], name=ion)
-                         for ion in conc.keys()]
-        self.tau = tau
-        self.delta_t = delta_t
-        self.t_end = t_end
-        self.goldman = None
-        self.henderson = None
-        self.delta_phi = None
-        self.exp_decay, self.t = None, None
-        self.psd, self.f = None, None
+        self.conc = conc
+        self._tau = tau
+        self._delta_t = delta_t
+        self._t_end = t_end
+        self._equation = 'sigma'  # 'goldman', 'henderson' or 'sigma'
+        self._analytic_psd = False
+        self.conc_trajectory = conc_trajectory
+
+    def _invalidate(self, names):
+        """Removing calculated quantities which must be calculated again."""
+        for name in names:
+            self._cache.pop(name, None)
+
+    def _lazy(self, name, calculate):
+        """Returns a calculated quantity, calculating it if needed."""
+        if self._cache.get(name) is None:
+            calculate()
+        return self._cache[name]
+
+    # ============================== parameters ===============================
+
+    @property
+    def conc(self):
+        return self._conc
+
+    @conc.setter
+    def conc(self, conc):
+        self._conc = conc
+        self.ions = ion_table(conc)
+        self._invalidate(potential_names + scaled_names)
+
+    @property
+    def ion_list(self):
+        """
+        The ions as a tuple of Ion instances, made from the ion table on each
+        access. They are copies, so changing them does not change the model,
+        set conc to change the concentrations.
+        """
+        return tuple(Ion(c=[ion['c_base'], ion['c_peak']],
+                         d=ion['D'] * lambda_n**2, z=ion['z'],
+                         name=str(ion['name'])) for ion in self.ions)
+
+    @property
+    def T(self):
+        return self._T
+
+    @T.setter
+    def T(self, temp):
+        self._T = temp
+        self._invalidate(potential_names + scaled_names)
 
+    @property
+    def tau(self):
+        return self._tau
+
+    @tau.setter
+    def tau(self, tau):
+        self._tau = tau
+        self._invalidate(decay_names + scaled_names)
+
+    @property
+    def delta_t(self):
+        return self._delta_t
+
+    @delta_t.setter
+    def delta_t(self, delta_t):
+        self._delta_t = delta_t
+        self._invalidate(grid_names + decay_names + scaled_names)
+
+    @property
+    def t_end(self):
+        return self._t_end
+
+    @t_end.setter
+    def t_end(self, t_end):
+        self._t_end = t_end
+        self._invalidate(grid_names + decay_names + scaled_names)
+
+    @property
+    def conc_trajectory(self):
+        """
+        Concentration time series {'ion': array} sampled at t, or None. Ions
+        which are not in the dict keep their base concentration.
+        """
+        return self._conc_trajectory
+
+    @conc_trajectory.setter
+    def conc_trajectory(self, trajectory):
+        self._conc_trajectory = trajectory
+        self._invalidate(scaled_names)
+
+    @property
+    def trajectory_mode(self):
+        """
+        True if the potential is calculated along a concentration trajectory
+        (conc_trajectory is given or tau is a dict), False if the initial
+        potential decays exponentially.
+        """
+        return self.conc_trajectory is not None or isinstance(self.tau, dict)
+
+    @property
+    def equation(self):
+        """
+        Equation used for the initial potential of the decay. Choosing
+        'goldman' raises ValueError when some ions are not monovalent.
+        """
+        return self._equation
+
+    @equation.setter
+    def equation(self, equation):
+        if equation == 'goldman':
+            check_monovalent(self.ions['z'])
+        if equation != self._equation:
+            self._equation = equation
+            self._invalidate(scaled_names)
+
+    @property
+    def analytic_psd(self):
+        """True if the PSD is calculated with the closed-form expression."""
+        return self._analytic_psd
+
+    @analytic_psd.setter
+    def analytic_psd(self, analytic):
+        if analytic != self._analytic_psd:
+            self._analytic_psd = analytic
+            self._invalidate(('unit_psd', 'psd'))
+
+    # ========================= calculated quantities =========================
+    # Setting one of these (e.g. from a cache) stores the value as calculated
+
+    @property
+    def goldman(self):
+        return self._lazy('goldman', self.goldman_eq)
+
+    @goldman.setter
+    def goldman(self, value):
+        self._cache['goldman'] = value
+        self._invalidate(scaled_names)
+
+    @property
+    def henderson(self):
+        return self._lazy('henderson', self.henderson_eq)
+
+    @henderson.setter
+    def henderson(self, value):
+        self._cache['henderson'] = value
+        self._invalidate(scaled_names)
+
+    @property
+    def delta_phi(self):
+        return self._lazy('delta_phi', self.delta_phi_eq)
+
+    @delta_phi.setter
+    def delta_phi(self, value):
+        self._cache['delta_phi'] = value
+        self._invalidate(scaled_names)
+
+    @property
+    def t(self):
+        return self._lazy('t', self._time_grid)
+
+    @t.setter
+    def t(self, t):
+        self._cache['t'] = t
+
+    @property
+    def f(self):
+        return self._lazy('f', self._frequency_grid)
+
+    @f.setter
+    def f(self, f):
+        self._cache['f'] = f
+
+    @property
+    def unit_decay(self):
+        """The exponential decay exp(-t/tau), with amplitude 1."""
+        return self._lazy('unit_decay', self._unit_decay)
+
+    @property
+    def unit_psd(self):
+        """PSD of the unit decay."""
+        return self._lazy('unit_psd', self._unit_power_spectrum_density)
+
+    @property
+    def scale(self):
+        """Amplitude of the decay, the absolute initial potential."""
+        return self._lazy('scale', self._scale)
+
+    @property
+    def potential_trajectory(self):
+        """
+        The potential (with sign) at each sample of t along the concentration
+        trajectory, from the chosen equation. Only in trajectory mode.
+        """
+        return self._lazy('potential_trajectory', self._potential_trajectory)
+
+    @property
+    def exp_decay(self):
+        if self._cache.get('exp_decay') is not None:  # set, e.g. from a cache
+            return self._cache['exp_decay']
+        if self.trajectory_mode:
+            return self.potential_trajectory
+        # only the scale is kept, the shared unit decay is scaled when used
+        return self.scale * self.unit_decay
+
+    @exp_decay.setter
+    def exp_decay(self, exp_decay):
+        self._cache['exp_decay'] = exp_decay
+
+    @property
+    def psd(self):
+        # the periodogram is quadratic in the signal, so the PSD of the decay
+        # is the PSD of the unit decay times the squared amplitude
+        if self._cache.get('psd') is not None:
+            return self._cache['psd']
+        if self.trajectory_mode:
+            return self._lazy('trajectory_psd',
+                              self._trajectory_power_spectrum_density)
+        return self.scale**2 * self.unit_psd
+
+    @psd.setter
+    def psd(self, psd):
+        self._cache['psd'] = psd
+
+    def _scale(self):
+        self._cache['scale'] = abs(self.current_potential())
+
+    def _time_grid(self):
+        self.t = shared_grids.time_grid(self.delta_t, self.t_end)
+
+    def _frequency_grid(self):
+        self.f = shared_grids.frequency_grid(self.delta_t, self.t_end)
+
+    # The decays and PSDs (used by exponential_decay, power_spectrum_density,
+    # calculate_everything and the properties) and the equations are stages
+    # of the instrumentation (see instrumentation.py), with the bytes of the
+    # calculated arrays. They are only recorded when it is turned on.
+
+    @instrumented('DiffusionPotential.exponential_decay',
+                  nbytes=lambda self: self._cache['unit_decay'].nbytes)
+    def _unit_decay(self):
+        self._cache['unit_decay'] = shared_grids.unit_decay(
+            self.tau, self.delta_t, self.t_end)
+
+    @instrumented('DiffusionPotential.power_spectrum_density',
+                  nbytes=lambda self: self._cache['unit_psd'].nbytes)
+    def _unit_power_spectrum_density(self):
+        self._cache['unit_psd'] = shared_grids.unit_psd(
+            self.tau, self.delta_t, self.t_end, analytic=self.analytic_psd)
+
+    def concentration_trajectory(self):
+        """
+        Concentrations of all ions at each sample of t, shape
+        (ions, samples), with the ions in the order of the ion table. Taken
+        from conc_trajectory if it is given, else each ion decays exponentially
+        from its max to its base concentration with its own tau.
+        """
+        n_points = len(self.t)
+        c = np.empty(shape=(len(self.ions), n_points))
+        for row, (name, base, peak) in enumerate(zip(
+                self.ions['name'], self.ions['c_base'],
+                self.ions['c_peak'])):  # loop over the ions only
+            if self.conc_trajectory is None:
+                unit_decay = shared_grids.unit_decay(self.tau[name],
+                                                     self.delta_t, self.t_end)
+                c[row] = base + (peak - base) * unit_decay
+            elif name in self.conc_trajectory:
+                series = np.asarray(self.conc_trajectory[name], dtype=float)
+                if series.shape != (n_points,):
+                    raise ValueError(f'the trajectory of {name} must '
+                                     f'have {n_points} samples, one per t')
+                c[row] = series
+            else:
+                c[row] = base
+        return c
+
+    @instrumented('DiffusionPotential.exponential_decay',
+                  nbytes=lambda self:
+                  self._cache['potential_trajectory'].nbytes)
+    def _potential_trajectory(self):
+        equation = potential_equations[self.equation]
+        self._cache['potential_trajectory'] = equation(
+            self.ions['D'], self.ions['z'], self.ions['c_base'][:, np.newaxis],
+            self.concentration_trajectory(), self.T)
+
+    @instrumented('DiffusionPotential.power_spectrum_density',
+                  nbytes=lambda self: self._cache['trajectory_psd'].nbytes)
+    def _trajectory_power_spectrum_density(self):
+        # real FFT, multi-threaded for long trajectories
+        self._cache['trajectory_psd'] = spectral.periodogram(
+            self.potential_trajectory, 1 / self.delta_t)[1]
+
+    # =============================== equations ===============================
+    # The equations store the potentials directly in _cache: a potential
+    # calculated when it is first read is the one the decays were made with,
+    # so they are kept. Only a new value (e.g. set from outside) invalidates
+    # them.
+
+    def _store_potential(self, name, value):
+        previous = self._cache.get(name)
+        self._cache[name] = value
+        if previous is not None and not np.array_equal(previous, value,
+                                                       equal_nan=True):
+            self._invalidate(scaled_names)
+
+    @instrumented('DiffusionPotential.goldman_eq')
     def goldman_eq(self):
         """
         Calculating the potential using the Goldman equation. The value
-        of the potential is in milli-volt [mV]
+        of the potential is in milli-volt [mV]. It is nan when some ions are
+        not monovalent, as in all_potentials, so that all potentials can be
+        read for any mixture (choosing the Goldman equation for the decay
+        raises ValueError, see equation).
         """
-        numerator_sum = 0
-        denominator_sum = 0
-        for ion in self.ion_list:  # loop through each ion
-            if ion.z > 0:  # a positive ion c = [base, max delta c]
-                numerator_sum += ion.D * ion.c[0]
-                denominator_sum += ion.D * ion.c[1]
-            else:  # negative ion
-                numerator_sum += ion.D * ion.c[1]
-                denominator_sum += ion.D * ion.c[0]
-        self.goldman = (R * self.T / F) * \
-                       (np.log(numerator_sum / denominator_sum)) * 1000
+        ions = self.ions
+        if monovalent(ions['z']):
+            potential = goldman_potential(ions['D'], ions['z'],
+                                          ions['c_base'], ions['c_peak'],
+                                          self.T)
+        else:
+            potential = np.nan
+        self._store_potential('goldman', potential)
 
+    @instrumented('DiffusionPotential.henderson_eq')
     def henderson_eq(self):
         """
         Calculating the potential using the Henderson equation. The value
         of the potential is in milli-volt [mV]
         """
-        num_sum = 0
-        denom_sum = 0
-        num_ln = 0
-        denom_ln = 0
-        for ion in self.ion_list:  # loop through each ion
-            num_sum += ion.D * abs(ion.z) / ion.z * (ion.c[1] - ion.c[0])
-            denom_sum += ion.D * abs(ion.z) * (ion.c[1] - ion.c[0])
-            num_ln += ion.D * abs(ion.z) * ion.c[0]
-            denom_ln += ion.D * abs(ion.z) * ion.c[1]
-        self.henderson = (R * self.T / F) * (num_sum / denom_sum) * \
-                         (np.log(num_ln / denom_ln)) * 1000
+        ions = self.ions
+        self._store_potential('henderson', henderson_potential(
+            ions['D'], ions['z'], ions['c_base'], ions['c_peak'], self.T))
 
     def average_sigma(self):
         """Calculating an estimate for the average sigma, conductivity"""
         psi = (R * self.T) / F
-        summation = 0
-        for ion in self.ion_list:
-            # ion c = [min, max]
-            summation += ion.D * (ion.z ** 2) * (ion.c[0] + ion.c[1]) / 2
+        ions = self.ions
+        summation = (ions['D'] * ions['z']**2) @ \
+            ((ions['c_base'] + ions['c_peak']) / 2)
         return (F / psi) * summation
 
+    @instrumented('DiffusionPotential.delta_phi_eq')
     def delta_phi_eq(self):
         """
         Calculating the potential using an approximated equation using the
         average sigma. The value of the potential is in milli-volt [mV]
         """
-        summation = 0
-        for ion in self.ion_list:
-            summation += ion.D * (ion.z ** 2) * (ion.c[1] - ion.c[0])
-        self.delta_phi = (F / self.average_sigma()) * summation * 1000
+        ions = self.ions
+        self._store_potential('delta_phi', sigma_potential(
+            ions['D'], ions['z'], ions['c_base'], ions['c_peak'], self.T))
 
     def exponential_decay(self, g=False, h=False):
         """
@@ -117,37 +729,85 @@ class DiffusionPotential:
         Then the potential is calculated with an exponential decay. The unit
         of the decaying potential is in milli-volt [mV]
         """
-        self.t = np.linspace(0, self.t_end, num=int(self.t_end / self.delta_t))
+        self.equation = equation_name(g=g, h=h)
+        self._invalidate(('exp_decay',))
+        if self.trajectory_mode:
+            self._lazy('potential_trajectory', self._potential_trajectory)
+        else:
+            self._lazy('unit_decay', self._unit_decay)
+
+    def initial_potential(self, g=False, h=False):
+        """
+        Returns the initial potential chosen with g and h, see
+        exponential_decay.
+        """
         if g:
-            init_potential = self.goldman
+            return self.goldman
         elif h:
-            init_potential = self.henderson
+            return self.henderson
+        return self.delta_phi
+
+    def current_potential(self):
+        """Returns the initial potential of the chosen equation."""
+        return self.initial_potential(g=self.equation == 'goldman',
+                                      h=self.equation == 'henderson')
+
+    def power_spectrum_density(self, analytic=False, g=False, h=False):
+        """
+        Calculating the PSD using the periodogram function. With
+        analytic=True the PSD is calculated with the closed-form expression
+        in psd_of_exponential_decay instead, using the initial potential
+        chosen with g and h (see exponential_decay). Then exp_decay is not
+        needed. In trajectory mode the PSD of potential_trajectory is
+        calculated, and analytic=True is not possible.
+        """
+        self._check_analytic(analytic)
+        self.analytic_psd = analytic
+        if analytic:
+            self.equation = equation_name(g=g, h=h)
+        self._invalidate(('psd',))
+        if self.trajectory_mode:
+            self._lazy('trajectory_psd',
+                       self._trajectory_power_spectrum_density)
         else:
-            init_potential = self.delta_phi
-        self.exp_decay = abs(init_potential) * np.exp(-self.t / self.tau)
+            self._lazy('unit_psd', self._unit_power_spectrum_density)
 
-    def power_spectrum_density(self):
-        """Calculating the PSD using the periodogram function."""
-        fs = 1 / self.delta_t
-        self.f, self.psd = periodogram(self.exp_decay, fs)
+    def _check_analytic(self, analytic):
+        if analytic and self.trajectory_mode:
+            raise ValueError('the analytic PSD is only possible for an '
+                             'exponentially decaying potential, not in '
+                             'trajectory mode')
 
-    def calculate_everything(self, goldman=False, henderson=False):
+    @instrumented('DiffusionPotential.calculate_everything')
+    def calculate_everything(self, goldman=False, henderson=False,
+                             analytic_psd=False):
         """
         This is the 'main' method which calculates everything and updates the
         attributes of a class instance by using the other methods of the class.
+        With analytic_psd=True the PSD is calculated with the closed-form
+        expression, and the time series (t, exp_decay) is not calculated.
+        Only the initial potential of the chosen equation is calculated here,
+        and quantities which are still valid are not calculated again.
+        exp_decay and psd are the shared unit decay and its PSD scaled by
+        the initial potential when they are used.
+        In trajectory mode the potential is calculated along the whole
+        concentration trajectory (vectorized), followed by its PSD.
         """
+        self._check_analytic(analytic_psd)
+        self.equation = equation_name(g=goldman, h=henderson)
+        self.analytic_psd = analytic_psd
+
         # Calculate initial potential
-        self.goldman_eq()
-        self.henderson_eq()
-        self.delta_phi_eq()
+        self.current_potential()
+
+        if self.trajectory_mode:
+            self._lazy('trajectory_psd',
+                       self._trajectory_power_spectrum_density)
+            return
 
         # Letting the potential decay exponentially
-        if goldman:
-            self.exponential_decay(g=goldman)
-        elif henderson:
-            self.exponential_decay(h=henderson)
-        else:
-            self.exponential_decay()
+        if not analytic_psd:
+            self._lazy('unit_decay', self._unit_decay)
 
         # Calculating the power spectrum density
-        self.power_spectrum_density()
+        self._lazy('unit_psd', self._unit_power_spectrum_density)
@@ -0,0 +1,216 @@
+import numpy as np
+from spectral import periodogram
+from diffusionpotential import R, F, lambda_n, valence_array, \
+    diffcoeff_array, ion_indices, goldman_potential, henderson_potential, \
+    sigma_potential, all_potentials, psd_of_exponential_decay, shared_grids, \
+    equation_name, check_monovalent
+from scenario import ions as scenario_ions
+
+# This file contains the class DiffusionPotentialBatch, a vectorized version
+# of DiffusionPotential. Instead of one instance per concentration set, one
+# instance holds N concentration sets (cases) in ion-by-case matrices, and the
+# Goldman, Henderson and approximated potentials of all cases are calculated
+# with one NumPy broadcast. A batch can be made directly from the
+# concentration arrays of the array scenario functions in scenario.py, or from
+# (cases, ions) concentration matrices of any mixture of the ions in
+# diffusionpotential.py (K, Na, Cl, Ca, Mg and HCO3), see from_mixture.
+
+
+class DiffusionPotentialBatch:
+    def __init__(self, c_base, c_peak, tau, delta_t, t_end,
+                 ions=('K', 'Na', 'Cl'), temp=310, names=None):
+        """
+        Initialize a batch of cases.
+        :param c_base: [array] baseline concentrations, shape (ions, cases)
+        :param c_peak: [array] concentrations at max change, shape
+                       (ions, cases)
+        :param tau: [float or array] time constant(s), one per case
+        :param delta_t: [float] time step
+        :param t_end: [float] end time of the decay
+        :param ions: [sequence] ion names, one per row of c_base/c_peak
+        :param temp: [float or array] temperature(s) in K, one per case
+        :param names: [sequence or None] name of each case
+        """
+        self.ions = tuple(ions)
+        # contiguous, so that the matrix products in all_potentials are fast
+        # also for views, e.g. from from_tensor
+        self.c_base = np.ascontiguousarray(np.atleast_2d(c_base), dtype=float)
+        self.c_peak = np.ascontiguousarray(np.atleast_2d(c_peak), dtype=float)
+        if self.c_base.shape != self.c_peak.shape:
+            raise ValueError('c_base and c_peak must have the same shape')
+        if self.c_base.shape[0] != len(self.ions):
+            raise ValueError('one row of concentrations is needed per ion')
+        n_cases = self.c_base.shape[1]
+        self.tau = np.broadcast_to(np.asarray(tau, dtype=float), (n_cases,))
+        self.T = np.broadcast_to(np.asarray(temp, dtype=float), (n_cases,))
+        self.delta_t = delta_t
+        self.t_end = t_end
+        self.names = list(names) if names is not None else None
+        # diffusion constants in ECS and valences, one per ion
+        index = ion_indices(self.ions)
+        self.D = diffcoeff_array[index] / lambda_n**2
+        self.z = valence_array[index]
+        self.goldman = None
+        self.henderson = None
+        self.delta_phi = None
+        # equation used for the decays and PSDs, 'goldman', 'henderson' or
+        # 'sigma', None before they are calculated. 'goldman' can only be
+        # chosen when all ions are monovalent.
+        self.equation = None
+        self.exp_decay, self.t = None, None
+        self.psd, self.f = None, None
+
+    @classmethod
+    def from_conc_list(cls, conc_list, tau, delta_t, t_end, temp=310,
+                       names=None):
+        """
+        Make a batch from a list of concentration dicts, as returned by the
+        scenario functions ({'ion': [base, base+/-change]}). All dicts must
+        have the same ions.
+        """
+        ions = tuple(conc_list[0].keys())
+        c = np.array([[conc[ion] for ion in ions] for conc in conc_list],
+                     dtype=float)  # shape (cases, ions, 2)
+        return cls.from_tensor(c, tau=tau, delta_t=delta_t, t_end=t_end,
+                               ions=ions, temp=temp, names=names)
+
+    @classmethod
+    def from_tensor(cls, c, tau, delta_t, t_end, ions=scenario_ions,
+                    temp=310, names=None):
+        """
+        Make a batch from a concentration array with shape (cases, ions, 2),
+        where the last axis is [base, base+/-change], as returned by the
+        array scenario functions (e.g. scenario1_array in scenario.py).
+        """
+        c = np.asarray(c, dtype=float)
+        return cls(c_base=c[:, :, 0].T, c_peak=c[:, :, 1].T, tau=tau,
+                   delta_t=delta_t, t_end=t_end, ions=ions, temp=temp,
+                   names=names)
+
+    @classmethod
+    def from_mixture(cls, ions, c_base, c_peak, tau, delta_t, t_end,
+                     temp=310, names=None):
+        """
+        Make a batch from concentration matrices with one row per case and
+        one column per ion, e.g. ions=('K', 'Na', 'Cl', 'Ca', 'Mg', 'HCO3').
+        c_base can also be one row (ions,), the same baseline for all cases.
+        """
+        c_peak = np.atleast_2d(np.asarray(c_peak, dtype=float))
+        c_base = np.broadcast_to(np.asarray(c_base, dtype=float),
+                                 c_peak.shape)
+        return cls(c_base=c_base.T, c_peak=c_peak.T, tau=tau,
+                   delta_t=delta_t, t_end=t_end, ions=ions, temp=temp,
+                   names=names)
+
+    @property
+    def n_cases(self):
+        return self.c_base.shape[1]
+
+    def goldman_eq(self):
+        """
+        Calculating the potential of every case using the Goldman equation.
+        The value of the potential is in milli-volt [mV]
+        """
+        self.goldman = goldman_potential(self.D, self.z, self.c_base,
+                                         self.c_peak, self.T)
+
+    def henderson_eq(self):
+        """
+        Calculating the potential of every case using the Henderson
+        equation. The value of the potential is in milli-volt [mV]
+        """
+        self.henderson = henderson_potential(self.D, self.z, self.c_base,
+                                             self.c_peak, self.T)
+
+    def average_sigma(self):
+        """Calculating an estimate for the average sigma of every case"""
+        psi = (R * self.T) / F
+        summation = (self.D * self.z**2) @ ((self.c_base + self.c_peak) / 2)
+        return (F / psi) * summation
+
+    def delta_phi_eq(self):
+        """
+        Calculating the potential of every case using the approximated
+        equation with the average sigma. The value of the potential is in
+        milli-volt [mV]
+        """
+        self.delta_phi = sigma_potential(self.D, self.z, self.c_base,
+                                         self.c_peak, self.T)
+
+    def potentials(self):
+        """
+        Calculating the Goldman, Henderson and approximated potentials for
+        all cases, with one pass over the concentrations (see
+        all_potentials). Returns the three arrays, each with shape (cases,).
+        The Goldman potentials are nan when some ions are not monovalent.
+        """
+        self.goldman, self.henderson, self.delta_phi = all_potentials(
+            self.D, self.z, self.c_base, self.c_peak, self.T)
+        return self.goldman, self.henderson, self.delta_phi
+
+    def initial_potential(self, g=False, h=False):
+        """Returns the initial potential chosen as in exponential_decay."""
+        if g:
+            return self.goldman
+        elif h:
+            return self.henderson
+        return self.delta_phi
+
+    def current_potential(self):
+        """Returns the initial potentials of the equation used."""
+        if self.equation is None:
+            raise ValueError('no equation has been used yet, call '
+                             'calculate_everything first')
+        return self.initial_potential(g=self.equation == 'goldman',
+                                      h=self.equation == 'henderson')
+
+    def _choose_equation(self, g=False, h=False):
+        """Recording the equation chosen with g and h, see equation."""
+        if g:
+            check_monovalent(self.z)
+        self.equation = equation_name(g=g, h=h)
+
+    def exponential_decay(self, g=False, h=False):
+        """
+        Letting the potential of every case decay exponentially. The same
+        choice of equation as in DiffusionPotential.exponential_decay. The
+        result has shape (cases, time) and is in milli-volt [mV], so keep
+        the number of cases small enough to fit in memory.
+        """
+        self._choose_equation(g=g, h=h)
+        self.t = shared_grids.time_grid(self.delta_t, self.t_end)
+        init_potential = self.initial_potential(g=g, h=h)
+        self.exp_decay = np.abs(init_potential)[:, np.newaxis] * \
+            np.exp(-self.t / self.tau[:, np.newaxis])
+
+    def power_spectrum_density(self, analytic=False, g=False, h=False):
+        """
+        Calculating the PSD of every case using the periodogram function, or
+        with the closed-form expression (analytic=True) from the initial
+        potentials chosen with g and h. The analytic version does not need
+        exp_decay, so the time series of the cases are never built.
+        """
+        if analytic:
+            self._choose_equation(g=g, h=h)
+            amplitude = np.abs(self.initial_potential(g=g, h=h))
+            self.f, self.psd = psd_of_exponential_decay(
+                amplitude, self.tau, self.delta_t, self.t_end)
+            return
+        fs = 1 / self.delta_t
+        self.f, self.psd = periodogram(self.exp_decay, fs)
+
+    def calculate_everything(self, goldman=False, henderson=False,
+                             analytic_psd=False):
+        """
+        Calculating the potentials, the exponential decays and the PSDs for
+        all cases, like DiffusionPotential.calculate_everything. The
+        equation used is recorded in equation. With goldman=True a
+        ValueError is raised when some ions are not monovalent.
+        """
+        self._choose_equation(g=goldman, h=henderson)
+        self.potentials()
+        if analytic_psd:
+            self.power_spectrum_density(analytic=True, g=goldman, h=henderson)
+            return
+        self.exponential_decay(g=goldman, h=henderson)
+        self.power_spectrum_density()
@@ -0,0 +1,73 @@
+import sys
+import json
+import subprocess
+
+# This file measures how long it takes to import each module of the
+# repository in a new Python process, which is about the time a worker in a
+# process pool (sweep.py, psd_of_crcns_lfp_data.py) needs before it can start
+# working. The heavy packages (pandas, matplotlib, sklearn, h5py, scipy.io,
+# scipy.signal) should only be imported when the code that needs them runs,
+# and the table also shows which of them were imported by each module.
+
+# the modules which are imported by other modules or by workers
+modules = ('scenario', 'spectral', 'slope_fit', 'diffusionpotential',
+           'diffusionpotential_batch', 'result_cache', 'sweep', 'lfp_loader',
+           'psd_store', 'psd_of_crcns_lfp_data', 'rendering', 'plot_psd_crcns',
+           'plot_psd_others', 'diffpot_and_psd', 'SD_diffpot_and_psd')
+
+heavy_packages = ('pandas', 'matplotlib', 'matplotlib.pyplot', 'sklearn',
+                  'h5py', 'scipy.io', 'scipy.signal')
+
+# run in the new process, prints the import time and the heavy packages
+_measure = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def import_time(module, repeat=3):
+    """
+    Importing module in a new process repeat times.
+
+    :param module: [str] name of the module
+    :param repeat: [int] number of new processes
+
+    :return: seconds: [float] the shortest import time in seconds
+             heavy: [list] the heavy packages imported with the module
+    """
+    code = _measure.format(module=module, heavy=heavy_packages)
+    best = float('inf')
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code], check=True,
+                                capture_output=True, text=True).stdout
+        seconds, heavy = json.loads(output.splitlines()[-1])
+        best = min(best, seconds)
+    return best, heavy
+
+
+def benchmark(names=modules, repeat=3):
+    """
+    Prints the import time of each module and the heavy packages it imports,
+    and returns the times in seconds by module.
+    """
+    baseline, _ = import_time('numpy', repeat)
+    print(f'{"numpy (baseline)":28s} {baseline * 1000:8.1f} ms')
+    times = {}
+    for module in names:
+        try:
+            seconds, heavy = import_time(module, repeat)
+        except subprocess.CalledProcessError as error:
+            print(f'{module:28s}   failed: '
+                  f'{error.stderr.strip().splitlines()[-1]}')
+            continue
+        times[module] = seconds
+        print(f'{module:28s} {seconds * 1000:8.1f} ms   {", ".join(heavy)}')
+    return times
+
+
+if __name__ == '__main__':
+    benchmark(sys.argv[1:] or modules)
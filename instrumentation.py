@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import atexit
+import functools
+import tracemalloc
+
+# This file contains an opt-in instrumentation of the slow stages of the
+# scripts (the equations, decays and PSDs in DiffusionPotential, and loading,
+# PSD, mean and saving in psd_of_crcns_lfp_data.py). For each run of a stage
+# the wall time, CPU time, bytes processed and peak memory allocated (traced
+# with tracemalloc) are recorded. The instrumentation is turned on with the
+# environment variable INSTRUMENT, e.g.
+# INSTRUMENT=1 python diffpot_and_psd.py            (summary table at exit)
+# INSTRUMENT=stages.jsonl python diffpot_and_psd.py (also one JSON line per
+#                                                    stage, also from the
+#                                                    worker processes)
+# or with enable(). When it is off, a stage costs one check of a global.
+# python instrumentation.py stages.jsonl prints the summary of a JSON lines
+# file.
+
+_state = None  # the settings and records when turned on, else None
+
+
+class _Off:
+    """The stage used when the instrumentation is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add_bytes(self, nbytes):
+        pass
+
+
+_off = _Off()
+
+
+class _Stage:
+    def __init__(self, name, nbytes=0):
+        """
+        One run of a stage, used as a with-block. The record is made when the
+        block ends.
+        :param name: [str] name of the stage
+        :param nbytes: [int] bytes processed (more can be added in the block
+                       with add_bytes)
+        """
+        self.name = name
+        self.nbytes = nbytes
+        self.inner_peak = 0  # the highest traced memory of inner stages
+
+    def add_bytes(self, nbytes):
+        self.nbytes += int(nbytes)
+
+    def __enter__(self):
+        stack = _state['stack']
+        if tracemalloc.is_tracing():
+            self.start_memory, peak = tracemalloc.get_traced_memory()
+            if stack:  # the outer stage keeps its peak so far
+                stack[-1].inner_peak = max(stack[-1].inner_peak, peak)
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, *args):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        stack = _state['stack']
+        stack.pop()
+        peak = None
+        if tracemalloc.is_tracing():
+            highest = max(tracemalloc.get_traced_memory()[1],
+                          self.inner_peak)
+            peak = highest - self.start_memory
+            if stack:
+                stack[-1].inner_peak = max(stack[-1].inner_peak, highest)
+        _record({'stage': self.name, 'wall': wall, 'cpu': cpu,
+                 'bytes': self.nbytes, 'peak': peak, 'depth': len(stack),
+                 'pid': os.getpid()})
+        return False
+
+
+def _record(record):
+    _state['records'].append(record)
+    if _state['file'] is not None:
+        _state['file'].write(json.dumps(record) + '\n')
+        _state['file'].flush()
+
+
+def enable(path=None, memory=True, summary_at_exit=True):
+    """
+    Turning the instrumentation on.
+
+    :param path: [str or None] JSON lines file the records are added to
+    :param memory: [bool] trace the peak memory (slows down code which
+                   allocates many small objects)
+    :param summary_at_exit: [bool] print the summary when Python exits
+    """
+    global _state
+    disable()
+    _state = {'records': [], 'stack': [], 'memory': memory,
+              'file': open(path, 'a', encoding='utf-8') if path else None}
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if summary_at_exit:
+        atexit.register(_summary_at_exit)
+
+
+def disable():
+    """Turning the instrumentation off. Returns the records."""
+    global _state
+    if _state is None:
+        return []
+    state, _state = _state, None
+    if state['file'] is not None:
+        state['file'].close()
+    if state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    atexit.unregister(_summary_at_exit)
+    return state['records']
+
+
+def enabled():
+    return _state is not None
+
+
+def records():
+    """The records of this process since enable()."""
+    return [] if _state is None else list(_state['records'])
+
+
+def stage(name, nbytes=0):
+    """
+    A stage as a with-block, e.g.
+    with stage('save') as record:
+        record.add_bytes(psd.nbytes)
+    """
+    if _state is None:
+        return _off
+    return _Stage(name, nbytes)
+
+
+def instrumented(name=None, nbytes=None):
+    """
+    Decorator making each call of a function a stage.
+
+    :param name: [str or None] name of the stage, None uses the qualified
+                 name of the function
+    :param nbytes: [function or None] bytes processed, called with the
+                   arguments of the function after it has returned
+    """
+    def decorator(function):
+        stage_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _state is None:
+                return function(*args, **kwargs)
+            with _Stage(stage_name) as record:
+                result = function(*args, **kwargs)
+                if nbytes is not None:
+                    record.add_bytes(nbytes(*args, **kwargs))
+            return result
+        return wrapper
+    return decorator
+
+
+def summary(stage_records=None):
+    """
+    Printing the records summed over each stage: calls, wall and CPU time,
+    bytes processed (and the rate) and the highest peak memory.
+
+    :param stage_records: [list or None] records, None uses records()
+    """
+    if stage_records is None:
+        stage_records = records()
+    stages = {}
+    for record in stage_records:
+        total = stages.setdefault(record['stage'],
+                                  {'calls': 0, 'wall': 0.0, 'cpu': 0.0,
+                                   'bytes': 0, 'peak': None})
+        total['calls'] += 1
+        total['wall'] += record['wall']
+        total['cpu'] += record['cpu']
+        total['bytes'] += record['bytes']
+        if record['peak'] is not None:
+            total['peak'] = max(total['peak'] or 0, record['peak'])
+
+    print(f'{"stage":44s} {"calls":>6s} {"wall [s]":>9s} {"cpu [s]":>9s} '
+          f'{"MB":>9s} {"MB/s":>8s} {"peak MB":>8s}')
+    for name, total in sorted(stages.items(), key=lambda item:
+                              -item[1]['wall']):
+        megabytes = total['bytes'] / 2**20
+        rate = megabytes / total['wall'] if total['wall'] > 0 else 0
+        peak = '' if total['peak'] is None else \
+            f'{total["peak"] / 2**20:8.1f}'
+        print(f'{name:44s} {total["calls"]:6d} {total["wall"]:9.3f} '
+              f'{total["cpu"]:9.3f} {megabytes:9.1f} {rate:8.1f} {peak:>8s}')
+
+
+def read_records(path):
+    """Reading the records from a JSON lines file."""
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def _summary_at_exit():
+    if _state is not None and _state['records']:
+        summary()
+
+
+# turned on from the environment, also in worker processes
+if os.environ.get('INSTRUMENT', '') not in ('', '0'):
+    enable(path=None if os.environ['INSTRUMENT'] == '1'
+           else os.environ['INSTRUMENT'])
+
+
+if __name__ == '__main__':
+    summary(read_records(sys.argv[1]))
@@ -0,0 +1,146 @@
+import numpy as np
+
+# This file contains one way of loading LFP data from .npy, HDF5 (.h5) and
+# .mat files. The LFP data is returned as a lazy channel x time view: slicing
+# the view only makes a new view, and the data is not read before it is used
+# as an array (e.g. by periodogram). .npy files are memory-mapped, HDF5
+# datasets and MATLAB v7.3 .mat files (which are HDF5 files) are read with
+# h5py, and older .mat files are loaded with loadmat, only the variables
+# needed. h5py and scipy.io are only imported when such a file is loaded.
+
+
+def _select(axis_range, index):
+    """Selecting an index (int or slice) from a range, returns a range."""
+    if isinstance(index, slice):
+        selected = axis_range[index]
+    else:
+        position = axis_range[index]
+        selected = range(position, position + 1)
+    if selected.step < 0:
+        raise ValueError('negative steps are not supported')
+    return selected
+
+
+def _as_slice(axis_range):
+    return slice(axis_range.start, axis_range.stop, axis_range.step)
+
+
+class LazyLFP:
+    def __init__(self, source, transposed=False, rows=None, cols=None,
+                 file=None):
+        """
+        Lazy channel x time view of LFP data.
+        :param source: [array, memmap or h5py.Dataset] the stored data
+        :param transposed: [bool] True if the data is stored as time x
+                           channel (e.g. MATLAB v7.3 files)
+        :param rows: [range or None] channels in the view, None for all
+        :param cols: [range or None] time points in the view, None for all
+        :param file: [h5py.File or None] open file, closed by close()
+        """
+        self.source = source
+        self.transposed = transposed
+        n_rows, n_cols = source.shape[::-1] if transposed else source.shape
+        self.rows = range(n_rows) if rows is None else rows
+        self.cols = range(n_cols) if cols is None else cols
+        self.file = file
+
+    @property
+    def shape(self):
+        return len(self.rows), len(self.cols)
+
+    @property
+    def nbytes(self):
+        """Size of the data in the view, when it is read."""
+        return len(self.rows) * len(self.cols) * self.source.dtype.itemsize
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        """
+        Slicing with slices returns a new view, integer indices read the
+        data, e.g. view[4:-6, :-1] is a view and view[0] is the first
+        channel as an array.
+        """
+        if not isinstance(index, tuple):
+            index = (index, slice(None))
+        rows, cols = index
+        view = LazyLFP(self.source, self.transposed,
+                       rows=_select(self.rows, rows),
+                       cols=_select(self.cols, cols), file=self.file)
+        if isinstance(rows, slice) and isinstance(cols, slice):
+            return view
+        data = view.read()
+        if not isinstance(cols, slice):
+            data = data[:, 0]
+        if not isinstance(rows, slice):
+            data = data[0]
+        return data
+
+    def read(self, dtype=None):
+        """Reading the data in the view into memory."""
+        rows, cols = _as_slice(self.rows), _as_slice(self.cols)
+        if self.transposed:
+            data = self.source[cols, rows].T
+        else:
+            data = self.source[rows, cols]
+        return np.asarray(data, dtype=dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read(dtype=dtype)
+        if copy and np.shares_memory(data, self.source):
+            data = data.copy()  # memory-mapped files are read-only
+        return data
+
+    def close(self):
+        """Closing the file (if any)."""
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_lfp_and_variables(path, lfp_name, variables):
+    """
+    Loading LFP data as a lazy channel x time view, together with other
+    (small) variables stored in the same file, e.g. the sampling rate. The
+    file is only opened once.
+
+    :param path: [str] path to a .npy, .h5/.hdf5 or .mat file
+    :param lfp_name: [str or None] name of the LFP variable (not used for
+                     .npy files)
+    :param variables: [sequence] names of the other variables
+
+    :return: lfp: [LazyLFP] the LFP data, channel x time
+             values: [dict] the other variables
+    """
+    values = {}
+    if path.endswith('.npy'):
+        return LazyLFP(np.load(path, mmap_mode='r')), values
+    import h5py
+    if h5py.is_hdf5(path):
+        h5 = h5py.File(path, 'r')
+        # MATLAB stores matrices column-major, so h5py sees them transposed
+        lfp = LazyLFP(h5[lfp_name], transposed=path.endswith('.mat'),
+                      file=h5)
+        values = {name: h5[name][()] for name in variables}
+    elif path.endswith('.mat'):
+        from scipy.io import loadmat
+        mat = loadmat(path, variable_names=[lfp_name] + list(variables))
+        lfp = LazyLFP(mat[lfp_name])
+        values = {name: mat[name] for name in variables}
+    else:
+        raise ValueError(f'unknown file type: {path}')
+    return lfp, values
+
+
+def load_lfp(path, lfp_name=None):
+    """
+    Loading LFP data as a lazy channel x time view, see
+    load_lfp_and_variables.
+    """
+    return load_lfp_and_variables(path, lfp_name, ())[0]
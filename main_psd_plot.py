@@ -1,31 +1,42 @@
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from plot_psd_crcns import get_data_filenames, plot_psd_data
+from rendering import collect_lines, draw_lines, show
+from psd_store import open_store
+from plot_psd_crcns import plot_psd_data, plot_log_spectrum
 from plot_psd_others import psd_torbjorn, psd_gratiy, psd_from_miller2009, \
     psd_from_baranauskas2012, psd_from_jankowski2017
 
-# This file plots PSD from all cases in one figure
+# This file plots PSD from all cases in one figure. All PSDs are loaded from
+# the PSD store (see psd_store.py) in one call.
 
 with_diff = True  # True = include diff, False = exclude diff
 with_SD = False  # True = include SD, False = exclude SD
+log_bins = 300  # log-spaced frequency bins, None plots every frequency
+batch_lines = True  # draw the spectra as LineCollections (faster)
+rasterize = False  # rasterize dense spectra inside the vector PDF
 plt.rc('font', size=13)
 plt.figure(figsize=(14, 10))
-psd_torbjorn()
+if batch_lines:
+    collect_lines()
+store = open_store()
+if log_bins is None:
+    spectra = store.load(log=True)  # log10 of f and PSD, cropped
+else:  # log10 of f and mean, min and max PSD in log-spaced bins, cropped
+    spectra = store.load_binned(n_bins=log_bins)
+psd_torbjorn(spectrum=spectra['torbjorn'])
 # CRCNS data
-crcns_files = sorted(get_data_filenames(), reverse=True)
+crcns_files = sorted(store.select(dataset='crcns'), reverse=True)
 colors = ['cornflowerblue', 'gold', 'limegreen', 'darksalmon',
           'maroon', 'darkslategray', 'darkcyan', 'saddlebrown',
           'darkkhaki', 'lightgreen', 'skyblue', 'plum']
 abbr = ['A', 'B', 'A', 'B', 'A', 'B', 'C', 'D', 'A', 'B', 'C', 'D']
 for file, color, abb in zip(crcns_files, colors, abbr):
-    plot_psd_data(file, color, abb)
+    plot_psd_data(file, color, abb, spectrum=spectra[file])
 
 # other PSD/LFP data
-psd_gratiy()
-psd_from_miller2009()
-psd_from_baranauskas2012()
-psd_from_jankowski2017()
+psd_gratiy(spectrum=spectra['gratiy'])
+psd_from_miller2009(spectrum=spectra['miller2009'])
+psd_from_baranauskas2012(spectrum=spectra['baranauskas2012'])
+psd_from_jankowski2017(spectrum=spectra['jankowski2017'])
 
 # Colors diffusion potentials
 colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
@@ -34,31 +45,23 @@ colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
 
 # Normal data
 if with_diff:
-    diff_data = pd.read_csv("Data_PSD_other/psd_data_normal.csv", index_col='f')
-    columns = diff_data.columns
-    frequency = diff_data.index.values
-
-    for col, color in zip(columns, colors):
-        psd = diff_data[col].values
-        plt.plot(np.log10(frequency), np.log10(psd), '--',
-                 color=color, label=col)
+    for name, color in zip(store.select(dataset='diffusion_normal'), colors):
+        plot_log_spectrum(spectra[name], color, linestyle='--',
+                          label=store.metadata(name)['label'])
 
     plt.title("PSDs of 'normal' diffusion potentials, CRCNS data sets and"
               " other LFP data")
 
 # Spreading depression
 if with_SD:
-    SD_data = pd.read_csv("Data_PSD_other/psd_data_SD.csv", index_col='f')
-    columns = SD_data.columns
-    frequency = SD_data.index.values
-
-    for col, color in zip(columns, colors):
-        psd = SD_data[col].values
-        plt.plot(np.log10(frequency), np.log10(psd), '-.',
-                 color=color, label=col)
+    for name, color in zip(store.select(dataset='diffusion_SD'), colors):
+        plot_log_spectrum(spectra[name], color, linestyle='-.',
+                          label=store.metadata(name)['label'])
 
     plt.title("PSD of 'pathological' diffusion potentials, CRCNS data sets"
               " and other LFP data")
+if batch_lines:
+    draw_lines(rasterize_dense=rasterize)
 # axis labels and legend
 plt.xlabel('log$_{10}$(frequency) [Hz]')
 plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
@@ -73,4 +76,4 @@ if with_diff:
 if with_SD:
     plt.savefig('Figures/SD_main_psd_plot.pdf', dpi=500, bbox_inches='tight')
 
-plt.show()
+show()  # only closes the figure when running headless
@@ -1,17 +1,27 @@
-import numpy as np
-import pandas as pd
 import matplotlib.pyplot as plt
-from plot_psd_crcns import get_data_filenames, plot_psd_data
+from rendering import collect_lines, draw_lines, show
+from psd_store import open_store
+from plot_psd_crcns import plot_psd_data, plot_log_spectrum
 from plot_psd_others import psd_torbjorn, psd_gratiy, psd_from_baranauskas2012
 
 with_diff = False  # True = include diff, False = exclude diff
 with_SD = True  # True = include SD, False = exclude SD
 zoom = False  # zoomed figure
+log_bins = 300  # log-spaced frequency bins, None plots every frequency
+batch_lines = True  # draw the spectra as LineCollections (faster)
+rasterize = False  # rasterize dense spectra inside the vector PDF
 plt.rc('font', size=13)
 plt.figure(figsize=(12, 7))
+if batch_lines:
+    collect_lines()
+store = open_store()  # all PSDs, see psd_store.py
+if log_bins is None:
+    spectra = store.load(log=True)  # log10 of f and PSD, cropped
+else:  # log10 of f and mean, min and max PSD in log-spaced bins, cropped
+    spectra = store.load_binned(n_bins=log_bins)
 
 # CRCNS data
-crcns_files = sorted(get_data_filenames(), reverse=True)
+crcns_files = sorted(store.select(dataset='crcns'), reverse=True)
 index = [4, -4, -1]
 colors = ['cornflowerblue', 'gold', 'limegreen', 'darksalmon',
           'maroon', 'darkslategray', 'darkcyan', 'saddlebrown',
@@ -21,14 +31,14 @@ abbr = ['A', 'B', 'A', 'B', 'A', 'B', 'C', 'D', 'A', 'B', 'C', 'D']
 crcns_files_red = [crcns_files[i] for i in index]
 colors_red = [colors[i] for i in index]
 abbr_red = [abbr[i] for i in index]
-psd_torbjorn()
+psd_torbjorn(spectrum=spectra['torbjorn'])
 
 for file, color, abb in zip(crcns_files_red, colors_red, abbr_red):
-    plot_psd_data(file, color, abb)
+    plot_psd_data(file, color, abb, spectrum=spectra[file])
 
 # other PSD/LFP data
-psd_gratiy()
-psd_from_baranauskas2012()
+psd_gratiy(spectrum=spectra['gratiy'])
+psd_from_baranauskas2012(spectrum=spectra['baranauskas2012'])
 
 # Colors diffusion potentials
 colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
@@ -37,28 +47,20 @@ colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b',
 
 # Normal diffusion data
 if with_diff:
-    diff_data = pd.read_csv("Data_PSD_other/psd_data_normal.csv", index_col='f')
-    columns = diff_data.columns
-    frequency = diff_data.index.values
-
-    for column, color in zip(columns, colors):
-        psd = diff_data[column].values
-        plt.plot(np.log10(frequency), np.log10(psd), '--',
-                 color=color, label=column)
+    for name, color in zip(store.select(dataset='diffusion_normal'), colors):
+        plot_log_spectrum(spectra[name], color, linestyle='--',
+                          label=store.metadata(name)['label'])
     plt.title("PSDs of LFPs versus 'normal' diffusion potentials")
 
 # Pathological diffusion data
 if with_SD:
-    SD_data = pd.read_csv("Data_PSD_other/psd_data_SD.csv", index_col='f')
-    columns = SD_data.columns
-    frequency = SD_data.index.values
-
-    for column, color in zip(columns, colors):
-        psd = SD_data[column].values
-        plt.plot(np.log10(frequency), np.log10(psd), '-.',
-                 color=color, label=column)
+    for name, color in zip(store.select(dataset='diffusion_SD'), colors):
+        plot_log_spectrum(spectra[name], color, linestyle='-.',
+                          label=store.metadata(name)['label'])
     plt.title("PSDs for LFPs versus 'pathological' diffusion potentials")
 
+if batch_lines:
+    draw_lines(rasterize_dense=rasterize)
 # axis labels and legend
 plt.xlabel('log$_{10}$(frequency) [Hz]')
 plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
@@ -82,4 +84,4 @@ if with_SD and zoom:
 elif with_SD:
     plt.savefig('Figures/SD_main_RED_psd_plot.pdf', dpi=500, bbox_inches='tight')
 
-plt.show()
+show()  # only closes the figure when running headless
@@ -0,0 +1,147 @@
+import sys
+import numpy as np
+from spectral import periodogram
+from diffusionpotential import shared_grids, psd_of_exponential_decay
+
+# This file stores exponentially decaying diffusion potentials by their
+# parameters instead of as long .csv tables. A potential amplitude*exp(-t/tau)
+# (and its PSD) is fully given by the amplitude (the absolute value of the
+# initial potential), tau, delta_t and t_end, so only these are stored, one
+# row per model, in a .npz file (e.g. Data_PSD_other/diffusion_normal.npz made
+# by diffpot_and_psd.py). The potentials and PSDs are calculated again when
+# they are used (potentials, power_spectra), and give the same values as
+# DiffusionPotentialBatch. The sampled arrays can be stored in the file as
+# well (samples in save_models), and the old .csv tables can still be written
+# with export_csv, e.g.
+# python parametric_potentials.py Data_PSD_other/diffusion_normal.npz
+#        Data_PSD_other/potential_data_normal.csv
+#        Data_PSD_other/psd_data_normal.csv
+
+# fields of the table of models, the amplitude in mV and times in seconds
+model_dtype = [('name', 'U64'), ('amplitude', float), ('tau', float),
+               ('delta_t', float), ('t_end', float)]
+
+
+def models_from_batch(batch):
+    """
+    The table of models of a DiffusionPotentialBatch, with the amplitudes
+    from the equation used in batch.calculate_everything (batch.equation).
+
+    :param batch: [DiffusionPotentialBatch] batch with the potentials
+                  calculated
+
+    :return: models: [structured array] one row per case, see model_dtype
+    """
+    models = np.zeros(batch.n_cases, dtype=model_dtype)
+    models['name'] = batch.names if batch.names is not None else \
+        [str(index) for index in range(batch.n_cases)]
+    models['amplitude'] = np.abs(batch.current_potential())
+    models['tau'] = batch.tau
+    models['delta_t'] = batch.delta_t
+    models['t_end'] = batch.t_end
+    return models
+
+
+def save_models(path, models, samples=(), **arrays):
+    """
+    Saving the models to a .npz file.
+
+    :param path: [str] the file
+    :param models: [structured array] table of models, see model_dtype
+    :param samples: [sequence] sampled arrays stored with the parameters,
+                    any of 'exp_decay' (together with t) and 'psd' (together
+                    with f), calculated from the models
+    :param arrays: [arrays] other arrays stored in the file
+    """
+    models = np.asarray(models, dtype=model_dtype)
+    if 'exp_decay' in samples:
+        arrays['t'], arrays['exp_decay'] = potentials(models)
+    if 'psd' in samples:
+        arrays['f'], arrays['psd'] = power_spectra(models)
+    np.savez(path, models=models, **arrays)
+
+
+def load_models(path):
+    """Reading the table of models from a .npz file."""
+    with np.load(path) as data:
+        return data['models']
+
+
+def load_samples(path, name):
+    """
+    Reading a sampled array stored with save_models (e.g. 'psd' or 'f'),
+    None if it is not in the file.
+    """
+    with np.load(path) as data:
+        return data[name] if name in data.files else None
+
+
+def _common_grid(models):
+    """delta_t and t_end, which must be the same for all models."""
+    if len(np.unique(models['delta_t'])) > 1 or \
+            len(np.unique(models['t_end'])) > 1:
+        raise ValueError('all models must have the same delta_t and t_end')
+    return float(models['delta_t'][0]), float(models['t_end'][0])
+
+
+def potentials(models):
+    """
+    The exponentially decaying potentials of the models.
+
+    :param models: [structured array] table of models with the same delta_t
+                   and t_end
+
+    :return: t: [array] time
+             exp_decay: [array] potentials in mV, shape (models, time)
+    """
+    delta_t, t_end = _common_grid(models)
+    t = shared_grids.time_grid(delta_t, t_end)
+    exp_decay = models['amplitude'][:, np.newaxis] * \
+        np.exp(-t / models['tau'][:, np.newaxis])
+    return t, exp_decay
+
+
+def power_spectra(models, analytic=False):
+    """
+    The PSDs of the potentials of the models, with the periodogram of the
+    potentials, or with the closed-form expression (analytic=True) which does
+    not build the potentials.
+
+    :param models: [structured array] table of models with the same delta_t
+                   and t_end
+
+    :return: f: [array] sample frequencies
+             psd: [array] PSDs in mV^2/Hz, shape (models, frequencies)
+    """
+    delta_t, t_end = _common_grid(models)
+    if analytic:
+        return psd_of_exponential_decay(models['amplitude'], models['tau'],
+                                        delta_t, t_end)
+    t, exp_decay = potentials(models)
+    return periodogram(exp_decay, 1 / delta_t)
+
+
+def export_csv(models, potential_path=None, psd_path=None):
+    """
+    Writing the potentials and/or the PSDs as .csv tables, as written by
+    diffpot_and_psd.py before: a column 't' (or 'f') followed by one column
+    per model.
+
+    :param models: [structured array] table of models
+    :param potential_path: [str or None] file for the potentials
+    :param psd_path: [str or None] file for the PSDs
+    """
+    import pandas as pd  # only needed for the export
+
+    for path, x_name, calculate in ((potential_path, 't', potentials),
+                                    (psd_path, 'f', power_spectra)):
+        if path is None:
+            continue
+        x, values = calculate(models)
+        table = {x_name: x}
+        table.update(zip(models['name'], values))
+        pd.DataFrame(data=table).to_csv(path, index=False)
+
+
+if __name__ == '__main__':
+    export_csv(load_models(sys.argv[1]), *sys.argv[2:4])
@@ -1,10 +1,11 @@
 import os
 import numpy as np
-import matplotlib.pyplot as plt
+from rendering import plot_line, show
 
 # This file load the PSD data (which was saved in files by
 # psd_of_crcns_lfp_data.py) and plot everything in one figure.
 # All data taken from CRCNS.org.
+# matplotlib is only imported when something is plotted (see rendering.py).
 
 
 def get_data_filenames():
@@ -20,33 +21,58 @@ def get_data_filenames():
     return datafiles
 
 
-def plot_psd_data(filename, line_color, name):
-    # Loading data
-    data = np.load('Data_PSD_crcns/'+filename)
-    f = np.array(data['f'][0, :])
-    psd = np.array(data['PSD'])
+def plot_log_spectrum(spectrum, color, label, linewidth=None,
+                      linestyle='-'):
+    """
+    Plotting a spectrum given as log10 values, either (log_f, log_psd) or
+    (log_f, log_psd, log_min, log_max) from log-spaced frequency bins (see
+    spectral.log_bin), where the min/max envelope is shaded. The line is
+    collected after rendering.collect_lines().
+    """
+    plot_line(spectrum[0], spectrum[1], linestyle, color=color,
+              linewidth=linewidth, label=label)
+    if len(spectrum) == 4:
+        import matplotlib.pyplot as plt
+        plt.fill_between(spectrum[0], spectrum[2], spectrum[3], color=color,
+                         alpha=0.3, linewidth=0)
+
+
+def plot_psd_data(filename, line_color, name, spectrum=None):
+    """
+    Plotting the PSD of one CRCNS data file.
+    :param spectrum: [tuple or None] log10 values of the spectrum already
+                     cropped, e.g. from the PSD store (psd_store.py), see
+                     plot_log_spectrum. None loads the data from the file
+    """
     lw = 0.5
-    if 'hc2' in filename or 'pfc2' in filename:
-        # remove data below 0.1 Hz and over 300 Hz
-        index = np.where((f >= 0.1) & (f <= 300))
-        f = f[index]
-        psd = psd[index]
-        lw = 0.5
-    if 'ac2' in filename:
-        # remove data over 300 Hz
-        index = np.where((f <= 300))
-        f = f[index]
-        psd = psd[index]
-        lw = 1
-    if 'bf1' in filename:
+    if 'ac2' in filename or 'bf1' in filename:
         lw = 1
+    if spectrum is None:
+        # Loading data, with the min/max envelope if the PSD is binned
+        data = np.load('Data_PSD_crcns/'+filename)
+        f = np.array(data['f'][0, :])
+        values = np.array([data[key] for key in ('PSD', 'PSD_min', 'PSD_max')
+                           if key in data.files])
+        if 'hc2' in filename or 'pfc2' in filename:
+            # remove data below 0.1 Hz and over 300 Hz
+            index = np.where((f >= 0.1) & (f <= 300))
+            f = f[index]
+            values = values[:, index[0]]
+        if 'ac2' in filename:
+            # remove data over 300 Hz
+            index = np.where((f <= 300))
+            f = f[index]
+            values = values[:, index[0]]
+        spectrum = (np.log10(f), *np.log10(values))
 
     # Plotting psd vs. frequency
-    plt.plot(np.log10(f), np.log10(psd), color=line_color,
-             linewidth=lw, label=filename[4:8]+'_'+name)
+    plot_log_spectrum(spectrum, line_color, label=filename[4:8]+'_'+name,
+                      linewidth=lw)
 
 
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
     data_files = get_data_filenames()
 
     # Plotting
@@ -63,4 +89,4 @@ if __name__ == '__main__':
     plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
     plt.legend(loc="lower left", ncol=3, prop={'size': 9.0})
     plt.savefig('Figures/psd_of_lfp_data.pdf', dpi=500, bbox_inches='tight')
-    plt.show()
+    show()
@@ -1,84 +1,94 @@
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
+from plot_psd_crcns import plot_log_spectrum
+from slope_fit import fit_slopes, slope_table, print_table
 
 # This file plot PSD from data collected from figures and some data.
+# Each function can also be given the log10 values of the spectrum, e.g. from
+# the PSD store (psd_store.py), instead of loading the file, see
+# plot_psd_crcns.plot_log_spectrum.
+# The linear regressions are done with slope_fit.py, which leaves out the
+# points where log10 is not finite (f = 0 for Gratiy and the negative PSD
+# values at the highest frequencies for Jankowski).
+# pandas is only imported when a .csv file is loaded, and matplotlib when
+# something is plotted.
 
 
-def psd_torbjorn(do_linreg=False, color='cadetblue'):
-    # Loading data
-    data = np.load("Data_PSD_other/psd_torbjorn.npz")
+def _print_linreg(name, log_f, log_psd):
+    slope, intercept = fit_slopes(log_f, log_psd)
+    print(f'{name}\nintercept: ', intercept, '\nslope: ', slope)
+
+
+def psd_torbjorn(do_linreg=False, color='cadetblue', spectrum=None):
+    if spectrum is None:
+        # Loading data
+        data = np.load("Data_PSD_other/psd_torbjorn.npz")
+        spectrum = np.log10(data['f']), np.log10(data['PSD'])
     # Plotting psd vs. frequency
-    log_f = np.log10(data['f'])
-    log_psd = np.log10(data['PSD'])
-    plt.plot(log_f, log_psd, color=color,
-             linewidth=0.5, label='LFP-Torbjørn')
+    log_f, log_psd = spectrum[:2]
+    plot_log_spectrum(spectrum, color, label='LFP-Torbjørn', linewidth=0.5)
     if do_linreg:  # Linear Regression
-        linreg = LinearRegression()
-        linreg.fit(log_f.reshape(-1, 1), log_psd.reshape(-1, 1))
-        print('Torbjørn\nintercept: ', linreg.intercept_,
-              '\nslope: ', linreg.coef_)
+        _print_linreg('Torbjørn', log_f, log_psd)
 
 
-def psd_gratiy(do_linreg=False, color='palevioletred'):
-    # Loading data
-    data = np.load("Data_PSD_other/psd_gratiy.npz")
+def psd_gratiy(do_linreg=False, color='palevioletred', spectrum=None):
+    if spectrum is None:
+        # Loading data
+        data = np.load("Data_PSD_other/psd_gratiy.npz")
+        spectrum = np.log10(data['f']), np.log10(data['PSD'])
     # Plotting psd vs. frequency
-    log_f = np.log10(data['f'])
-    log_psd = np.log10(data['PSD'])
-    plt.plot(log_f, log_psd, color=color, label='LFP-Gratiy')
+    log_f, log_psd = spectrum[:2]
+    plot_log_spectrum(spectrum, color, label='LFP-Gratiy')
     if do_linreg:  # Linear Regression
-        linreg = LinearRegression()
-        linreg.fit(log_f[1:].reshape(-1, 1), log_psd[1:].reshape(-1, 1))
-        print('Gratiy\nintercept: ', linreg.intercept_,
-              '\nslope: ', linreg.coef_)
-
-
-def psd_from_baranauskas2012(do_linreg=False, color='darkolivegreen'):
-    # logX1,logY1,logX2,Y2
-    filepath = "Data_PSD_other/psd_Baranbuskas_Fig1C.csv"
-    data = pd.read_csv(filepath, usecols=['logX1', 'logY1'])
-    log_frequency = np.log10(data['logX1'].values)
-    log_psd = np.log10(data['logY1'].values / 1000 ** 2)  # from micro to milli
-    plt.plot(log_frequency, log_psd, color=color,
-             label='LFP-Baranauskas')
+        _print_linreg('Gratiy', log_f, log_psd)
+
+
+def psd_from_baranauskas2012(do_linreg=False, color='darkolivegreen',
+                             spectrum=None):
+    if spectrum is None:
+        # logX1,logY1,logX2,Y2
+        import pandas as pd
+        filepath = "Data_PSD_other/psd_Baranbuskas_Fig1C.csv"
+        data = pd.read_csv(filepath, usecols=['logX1', 'logY1'])
+        spectrum = (np.log10(data['logX1'].values),
+                    np.log10(data['logY1'].values / 1000 ** 2))  # to milli
+    log_frequency, log_psd = spectrum[:2]
+    plot_log_spectrum(spectrum, color, label='LFP-Baranauskas')
     if do_linreg:  # Linear Regression
-        linreg = LinearRegression()
-        linreg.fit(log_frequency.reshape(-1, 1), log_psd.reshape(-1, 1))
-        print('Baranauskas\nintercept: ', linreg.intercept_,
-              '\nslope: ', linreg.coef_)
-
-
-def psd_from_jankowski2017(do_linreg=False, color='goldenrod'):
-    filepath = "Data_PSD_other/psd_Jankowski2017_Fig2F.csv"
-    data = pd.read_csv(filepath, usecols=['X', 'Y'])
-    log_frequency = np.log10(data['X'].values)
-    log_psd = np.log10(data['Y'].values / 1000 ** 2)  # from micro to milli
-    plt.plot(log_frequency, log_psd, color=color, label='LFP-Jankowski')
+        _print_linreg('Baranauskas', log_frequency, log_psd)
+
+
+def psd_from_jankowski2017(do_linreg=False, color='goldenrod', spectrum=None):
+    if spectrum is None:
+        import pandas as pd
+        filepath = "Data_PSD_other/psd_Jankowski2017_Fig2F.csv"
+        data = pd.read_csv(filepath, usecols=['X', 'Y'])
+        spectrum = (np.log10(data['X'].values),
+                    np.log10(data['Y'].values / 1000 ** 2))  # to milli
+    log_frequency, log_psd = spectrum[:2]
+    plot_log_spectrum(spectrum, color, label='LFP-Jankowski')
     if do_linreg:  # Linear Regression
-        linreg = LinearRegression()
-        linreg.fit(log_frequency[:-4].reshape(-1, 1),
-                   log_psd[:-4].reshape(-1, 1))
-        print('Jankowski\nintercept: ', linreg.intercept_,
-              '\nslope: ', linreg.coef_)
-
-
-def psd_from_miller2009(do_linreg=False, color='sienna'):
-    # filepath = "Data_PSD_other/psd_Miller2009_Fig2A.csv"
-    filepath = "Data_PSD_other/Miller2009_Fig2A_28.04.csv"
-    data = pd.read_csv(filepath, usecols=['X', 'Y'])
-    log_frequency = np.log10(data['X'].values)
-    log_psd = np.log10(data['Y'].values / 1000 ** 2)  # from micro to milli
-    plt.plot(log_frequency, log_psd, color=color, label='LFP-Miller')
+        _print_linreg('Jankowski', log_frequency, log_psd)
+
+
+def psd_from_miller2009(do_linreg=False, color='sienna', spectrum=None):
+    if spectrum is None:
+        import pandas as pd
+        # filepath = "Data_PSD_other/psd_Miller2009_Fig2A.csv"
+        filepath = "Data_PSD_other/Miller2009_Fig2A_28.04.csv"
+        data = pd.read_csv(filepath, usecols=['X', 'Y'])
+        spectrum = (np.log10(data['X'].values),
+                    np.log10(data['Y'].values / 1000 ** 2))  # to milli
+    log_frequency, log_psd = spectrum[:2]
+    plot_log_spectrum(spectrum, color, label='LFP-Miller')
     if do_linreg:  # Linear Regression
-        linreg = LinearRegression()
-        linreg.fit(log_frequency.reshape(-1, 1), log_psd.reshape(-1, 1))
-        print('Miller\nintercept: ', linreg.intercept_,
-              '\nslope: ', linreg.coef_)
+        _print_linreg('Miller', log_frequency, log_psd)
 
 
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+    from rendering import show
+    from psd_store import open_store
+
     # Plotting
     plt.figure()
 
@@ -95,4 +105,11 @@ if __name__ == '__main__':
     plt.ylim([-10, 1.2])
     plt.legend(loc="lower left")
     plt.savefig('Figures/psd_from_figures+.pdf', dpi=500, bbox_inches='tight')
-    plt.show()
+    show()
+
+    # Slopes of the same spectra with 95 % bootstrap confidence intervals
+    store = open_store()
+    spectra = store.load(store.select(dataset='digitized') +
+                         store.select(dataset='torbjorn') +
+                         store.select(dataset='gratiy'))
+    print_table(slope_table(spectra, n_boot=1000, seed=0))
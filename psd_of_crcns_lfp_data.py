@@ -1,60 +1,246 @@
 import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
-from scipy.io import loadmat
-from scipy.signal import periodogram
+from instrumentation import stage
+from lfp_loader import load_lfp_and_variables
+from spectral import periodogram, mean_periodogram, log_bin
 
 # This file load LFP data stored in .mat (MATLAB-file) and calculates a mean
-# PSD for the data file. The mean PSD together with the frequency array f is
-# stored for later use in .npz files. Only for data from CRCNS.org.
+# PSD for the data file. The mean PSD together with the frequency array f
+# (and the sampling frequency fs) is stored for later use in .npz files. Only
+# for data from CRCNS.org.
+# The PSD is either calculated with the periodogram of all channels (batched
+# real FFTs, the whole recording in memory), or with a streaming Welch
+# estimate which reads a few segments at a time, so that long recordings don't
+# have to fit in memory.
+# All data files are processed in parallel, and files which have not changed
+# since the last run are skipped (see process_directory). With log_bins the
+# PSD is stored in log-spaced frequency bins (mean and min/max envelope)
+# instead of at the full resolution of the periodogram.
 
 
-def load_data_calculate_psd_and_save(file_name, lfp_name, fs_name):
+def welch_psd_streaming(data, fs, nperseg=4096, noverlap=None,
+                        segments_per_read=8):
+    """
+    Mean PSD over all channels and segments (Welch's method, Hann window)
+    calculated by reading segments_per_read segments of all channels at a
+    time. Only these segments are in memory, whatever the length of the
+    recording.
+
+    :param data: [array or LazyLFP] LFP data, channel x time, which
+                 can be sliced as data[:, start:stop]
+    :param fs: [float] sampling frequency
+    :param nperseg: [int] length of each segment
+    :param noverlap: [int or None] overlap between segments, None gives
+                     nperseg // 2
+    :param segments_per_read: [int] number of segments read at a time
+
+    :return: f: [array] sample frequencies
+             mean_psd: [array] mean PSD
+    """
+    from scipy.signal import welch
+
+    n_channels, n_samples = data.shape
+    nperseg = min(nperseg, n_samples)
+    if noverlap is None:
+        noverlap = nperseg // 2
+    if noverlap >= nperseg:  # the segments would not move forward
+        raise ValueError('noverlap must be less than nperseg')
+    step = nperseg - noverlap
+
+    psd_sum = np.zeros(nperseg // 2 + 1)
+    n_segments = 0
+    f = None
+    start = 0
+    while start + nperseg <= n_samples:
+        # read k whole segments, overlapping the next read by noverlap
+        k = min(segments_per_read, (n_samples - start - nperseg) // step + 1)
+        stop = start + nperseg + (k - 1) * step
+        block = np.asarray(data[:, start:stop], dtype=float)
+        f, pxx = welch(block, fs, nperseg=nperseg, noverlap=noverlap)
+        psd_sum += k * np.sum(pxx, axis=0)  # pxx is the mean of k segments
+        n_segments += k * n_channels
+        start += k * step
+    return f, psd_sum / n_segments
+
+
+def load_data_calculate_psd_and_save(file_name, lfp_name, fs_name,
+                                     method='batched', workers=-1,
+                                     float32=False, nperseg=4096,
+                                     noverlap=None, log_bins=None):
     """
     Loading the LFP data (and the sampling frequency) and calculating PSD with
     the periodogram function for each channel/row in the data. Then averaging
     to get a mean PSD estimate and saving it together with the frequency
     array in a file.
+    With method='batched' (default) the mean periodogram is calculated with
+    spectral.mean_periodogram (using workers threads and optionally
+    float32), with
+    method='welch' it is calculated with welch_psd_streaming instead, with
+    segments of length nperseg.
+    With log_bins (an int) the mean PSD is reduced to log_bins log-spaced
+    frequency bins (see spectral.log_bin) before it is saved, and the min and
+    max PSD in each bin are saved as PSD_min and PSD_max.
     """
-    data = loadmat('Data_LFP_crcns/'+file_name)[lfp_name]  # loading LFP data
-    fs = loadmat('Data_LFP_crcns/'+file_name)[fs_name]  # sampling rate
+    with stage('crcns: load') as record:
+        data, values = load_lfp_and_variables('Data_LFP_crcns/' + file_name,
+                                              lfp_name, [fs_name])
+        record.add_bytes(data.nbytes)
+    try:
+        fs = float(np.squeeze(values[fs_name]))  # sampling rate
 
-    psd = []
-    f = None
-    for row in data:
-        f, pxx = periodogram(row, fs)  # PSD for one row of LFP data
-        psd.append(pxx)
+        if method == 'batched':
+            with stage('crcns: mean PSD (batched)', data.nbytes):
+                f, mean_psd = mean_periodogram(data, fs, workers=workers,
+                                               float32=float32)
+        elif method == 'welch':
+            with stage('crcns: mean PSD (welch)', data.nbytes):
+                f, mean_psd = welch_psd_streaming(data, fs, nperseg=nperseg,
+                                                  noverlap=noverlap)
+        elif method == 'periodogram':
+            psd = []
+            f = None
+            with stage('crcns: per-channel PSD', data.nbytes):
+                for row in np.asarray(data[:, :]):
+                    # PSD for one row of LFP data
+                    f, pxx = periodogram(row, fs)
+                    psd.append(pxx)
+
+            with stage('crcns: mean') as record:
+                psd = np.array(psd)
+                record.add_bytes(psd.nbytes)
+                mean_psd = np.mean(psd, axis=0)  # mean PSD over all rows
+        else:
+            raise ValueError(f'unknown method: {method}')
+    finally:
+        data.close()  # also if the PSD fails
+
+    envelope = {}
+    if log_bins is not None:
+        with stage('crcns: log bins', mean_psd.nbytes):
+            f, mean_psd, psd_min, psd_max = log_bin(f, mean_psd,
+                                                    n_bins=log_bins)
+        envelope = {'PSD_min': psd_min, 'PSD_max': psd_max}
+
+    # Save to file, f is stored as a row as before (see plot_psd_crcns.py),
+    # together with the sampling frequency of the recording
+    with stage('crcns: save', f.nbytes + mean_psd.nbytes +
+               sum(array.nbytes for array in envelope.values())):
+        np.savez('Data_PSD_crcns/psd_' + file_name[:-4], f=np.atleast_2d(f),
+                 PSD=mean_psd, fs=fs, **envelope)
+
+
+def lfp_and_fs_names(file_name):
+    """
+    Names of the LFP variable and the sampling rate variable in a CRCNS data
+    file, found from the data set in the file name. Returns None for files
+    from other data sets.
+    """
+    if 'ac2' in file_name:
+        return 'all_sweeps_lfp', 'sample_per_second'
+    elif 'hc2' in file_name:
+        return 'volt_lfp', 'fs'
+    elif 'bf1' in file_name:
+        return 'LFP_data', 'fs'
+    elif 'pfc2' in file_name:
+        if 'ca1' in file_name:
+            return 'volt_ca1', 'fs'
+        return 'volt_pfc', 'fs'
+    return None
+
+
+def file_hash(path, block_size=2**20):
+    """SHA-256 hex digest of a file, read block_size bytes at a time."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _process_file(file_name, parameters):
+    """Calculating and saving the PSD of one file, returns its manifest."""
+    path = 'Data_LFP_crcns/' + file_name
+    lfp_name, fs_name = lfp_and_fs_names(file_name)
+    # one FFT thread per worker process, unless workers is given, since the
+    # files are already processed in parallel
+    load_data_calculate_psd_and_save(file_name, lfp_name, fs_name,
+                                     **{'workers': 1, **parameters})
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime,
+            'sha256': file_hash(path), 'parameters': parameters}
+
+
+def process_directory(processes=None,
+                      manifest_file='Data_PSD_crcns/manifest.json',
+                      **parameters):
+    """
+    Calculating and saving the mean PSD of every data file in Data_LFP_crcns,
+    with a pool of worker processes. A manifest stores the size, modification
+    time and hash of each data file together with the parameters used, and
+    files whose PSD file is up to date are skipped. If only the modification
+    time has changed, the hash decides whether the file has changed.
+
+    :param processes: [int or None] number of worker processes, None uses
+                      all cores
+    :param manifest_file: [str] path to the manifest (.json)
+    :param parameters: keyword arguments to load_data_calculate_psd_and_save
+                       (method, float32, nperseg, noverlap, log_bins, ...)
+
+    :return: processed: [list] names of the files which were processed
+    """
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as file:
+            manifest = json.load(file)
+
+    to_process = []
+    for file_name in sorted(os.listdir('Data_LFP_crcns')):
+        if not file_name.endswith('.mat') or \
+                lfp_and_fs_names(file_name) is None:
+            continue
+        path = 'Data_LFP_crcns/' + file_name
+        output = 'Data_PSD_crcns/psd_' + file_name[:-4] + '.npz'
+        entry = manifest.get(file_name)
+        stat = os.stat(path)
+        up_to_date = os.path.exists(output) and entry is not None and \
+            entry['parameters'] == parameters and \
+            entry['size'] == stat.st_size
+        if up_to_date and entry['mtime'] != stat.st_mtime:
+            # touched, but maybe not changed
+            up_to_date = entry['sha256'] == file_hash(path)
+            if up_to_date:
+                entry['mtime'] = stat.st_mtime
+        if not up_to_date:
+            to_process.append(file_name)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(_process_file, file_name, parameters):
+                   file_name for file_name in to_process}
+        # the manifest is written as each file is done, so that the files
+        # done are skipped next time also if a later file fails
+        for future in as_completed(futures):
+            file_name = futures[future]
+            manifest[file_name] = future.result()
+            print(file_name)
+            write_manifest(manifest, manifest_file)
+    if not to_process:  # e.g. touched files found to be unchanged
+        write_manifest(manifest, manifest_file)
+    return to_process
 
-    mean_psd = np.mean(np.array(psd), axis=0)  # mean PSD over all rows
 
-    # Save to file
-    np.savez('Data_PSD_crcns/psd_' + file_name[:-4], f=f, PSD=mean_psd)
+def write_manifest(manifest, manifest_file):
+    """Writing the manifest of process_directory to a .json file."""
+    # write to a temporary file first, so that the manifest is never broken
+    with open(manifest_file + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(manifest_file + '.tmp', manifest_file)
 
 
 if __name__ == '__main__':
-    # Getting all data file names
-    directory = "Data_LFP_crcns"
-    data_files = []
-    for file in os.listdir(directory):
-        if file.endswith(".mat"):
-            # Putting data file name into list
-            data_files.append(file)
-
-    # Using function above to load data, calculate PDS and save to file
-    counter = 1
-    for filename in data_files:
-        print(counter, filename)
-        counter += 1
-        if 'ac2' in filename:
-            load_data_calculate_psd_and_save(filename, 'all_sweeps_lfp',
-                                             'sample_per_second')
-        elif 'hc2' in filename:
-            load_data_calculate_psd_and_save(filename, 'volt_lfp', 'fs')
-
-        elif 'bf1' in filename:
-            load_data_calculate_psd_and_save(filename, 'LFP_data', 'fs')
-
-        elif 'pfc2' in filename:
-            if 'ca1' in filename:
-                load_data_calculate_psd_and_save(filename, 'volt_ca1', 'fs')
-            else:
-                load_data_calculate_psd_and_save(filename, 'volt_pfc', 'fs')
+    # Calculating the PSD of every data file which has changed since last run
+    # method: 'batched', 'periodogram' or 'welch', and e.g. log_bins=300 to
+    # store the PSDs in 300 log-spaced frequency bins
+    process_directory(method='batched')
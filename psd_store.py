@@ -0,0 +1,263 @@
+import os
+import glob
+import json
+import numpy as np
+from spectral import log_bin
+from parametric_potentials import load_models, power_spectra
+
+# This file contains a store for all the PSDs plotted in the main figures:
+# the CRCNS data sets (Data_PSD_crcns), the LFP data from Torbjørn and Gratiy,
+# the PSDs taken from figures in articles and the PSDs of the diffusion
+# potentials (calculated from diffusion_normal.npz and diffusion_SD.npz, if
+# they have been made, see parametric_potentials.py). The frequencies, PSDs
+# and their log10 values of all spectra are stored one after another in four
+# columns (.npy files) which are memory-mapped when the store is opened, and
+# an index (index.json) stores where each spectrum starts and stops together
+# with its metadata (data set, session, sampling frequency, units, crop range,
+# label, source file). The store is built from the source files, and built
+# again when a source file changes.
+# The spectra can also be loaded in log-spaced frequency bins with a min/max
+# envelope (load_binned), which is much faster to plot.
+
+store_directory = 'Data_PSD_store'
+columns = ('f', 'psd', 'log_f', 'log_psd')
+
+# crop ranges (min, max frequency) used when plotting the CRCNS data sets
+crcns_crop = {'hc2': (0.1, 300), 'pfc2': (0.1, 300), 'ac2': (None, 300)}
+
+# PSDs taken from figures: file, frequency column, PSD column and label
+digitized = {
+    'baranauskas2012': ('Data_PSD_other/psd_Baranbuskas_Fig1C.csv',
+                        'logX1', 'logY1', 'LFP-Baranauskas'),
+    'jankowski2017': ('Data_PSD_other/psd_Jankowski2017_Fig2F.csv',
+                      'X', 'Y', 'LFP-Jankowski'),
+    'miller2009': ('Data_PSD_other/Miller2009_Fig2A_28.04.csv',
+                   'X', 'Y', 'LFP-Miller')}
+
+# PSDs of diffusion potentials, data set name and file
+diffusion = {'diffusion_normal': 'Data_PSD_other/diffusion_normal.npz',
+             'diffusion_SD': 'Data_PSD_other/diffusion_SD.npz'}
+
+
+def _crop_indices(f, crop):
+    """Start and stop index of the frequencies inside crop (min, max)."""
+    low, high = crop
+    start = 0 if low is None else int(np.searchsorted(f, low, side='left'))
+    stop = len(f) if high is None else \
+        int(np.searchsorted(f, high, side='right'))
+    return start, stop
+
+
+def source_files():
+    """Returns the source files of the store which exist."""
+    files = sorted(glob.glob('Data_PSD_crcns/*.npz'))
+    files += ['Data_PSD_other/psd_torbjorn.npz',
+              'Data_PSD_other/psd_gratiy.npz']
+    files += [path for path, _, _, _ in digitized.values()]
+    files += list(diffusion.values())
+    return [path for path in files if os.path.exists(path)]
+
+
+def read_sources():
+    """
+    Reading all source files. Returns a list of (name, f, psd, metadata),
+    with the PSDs in mV^2/Hz.
+    """
+    import pandas as pd  # only needed when the store is built
+
+    spectra = []
+    for path in sorted(glob.glob('Data_PSD_crcns/*.npz')):
+        name = os.path.basename(path)[:-4]
+        data = np.load(path)
+        f = np.ravel(data['f'])
+        data_set = name.split('_')[1]
+        # fs is only in files made since it was stored with the PSD
+        fs = float(data['fs']) if 'fs' in data.files else None
+        spectra.append((name, f, data['PSD'],
+                        {'dataset': 'crcns', 'session': name[4:],
+                         'fs': fs, 'units': 'mV^2/Hz',
+                         'crop': crcns_crop.get(data_set, (None, None)),
+                         'label': name[4:8], 'source': path}))
+
+    for name, fs, label in (('torbjorn', 2000, 'LFP-Torbjørn'),
+                            ('gratiy', 2500, 'LFP-Gratiy')):
+        path = f'Data_PSD_other/psd_{name}.npz'
+        if os.path.exists(path):
+            data = np.load(path)
+            spectra.append((name, data['f'], data['PSD'],
+                            {'dataset': name, 'session': None, 'fs': fs,
+                             'units': 'mV^2/Hz', 'crop': (None, None),
+                             'label': label, 'source': path}))
+
+    for name, (path, f_column, psd_column, label) in digitized.items():
+        data = pd.read_csv(path, usecols=[f_column, psd_column])
+        spectra.append((name, data[f_column].values,
+                        data[psd_column].values / 1000 ** 2,  # micro to milli
+                        {'dataset': 'digitized', 'session': name, 'fs': None,
+                         'units': 'mV^2/Hz', 'crop': (None, None),
+                         'label': label, 'source': path}))
+
+    for data_set, path in diffusion.items():
+        if not os.path.exists(path):
+            continue
+        models = load_models(path)
+        f, psd = power_spectra(models)
+        for name, model_psd in zip(models['name'], psd):
+            spectra.append((data_set + '/' + name, f, model_psd,
+                            {'dataset': data_set, 'session': str(name),
+                             'fs': 1 / float(models['delta_t'][0]),
+                             'units': 'mV^2/Hz', 'crop': (None, None),
+                             'label': str(name), 'source': path}))
+    return spectra
+
+
+def write_store(spectra, directory=store_directory, sources=None):
+    """
+    Writing spectra to a store.
+
+    :param spectra: [list] (name, f, psd, metadata) of each spectrum, the
+                    metadata is a dict which can be stored as JSON
+    :param directory: [str] directory of the store
+    :param sources: [dict or None] modification time of each source file
+    """
+    os.makedirs(directory, exist_ok=True)
+    index = []
+    start = 0
+    for name, f, psd, metadata in spectra:
+        if len(f) != len(psd):
+            raise ValueError(f'f and psd of {name} have different lengths')
+        stop = start + len(f)
+        crop_start, crop_stop = _crop_indices(
+            np.asarray(f), metadata.get('crop', (None, None)))
+        index.append(dict(metadata, name=name, start=start, stop=stop,
+                          crop_start=start + crop_start,
+                          crop_stop=start + crop_stop))
+        start = stop
+
+    f = np.concatenate([np.asarray(s[1], dtype=float) for s in spectra])
+    psd = np.concatenate([np.asarray(s[2], dtype=float) for s in spectra])
+    # log10(0) = -inf at f = 0, and negative values (a few in the data
+    # taken from figures) give nan, as when plotting them before
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = {'f': f, 'psd': psd, 'log_f': np.log10(f),
+                  'log_psd': np.log10(psd)}
+    for column in columns:
+        np.save(os.path.join(directory, column + '.npy'), values[column])
+
+    # the index is written last, to a temporary file first
+    index_file = os.path.join(directory, 'index.json')
+    with open(index_file + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump({'spectra': index, 'sources': sources or {}}, file,
+                  indent=1, ensure_ascii=False)
+    os.replace(index_file + '.tmp', index_file)
+
+
+def build_store(directory=store_directory):
+    """Building the store from all source files, see read_sources."""
+    sources = {path: os.stat(path).st_mtime for path in source_files()}
+    write_store(read_sources(), directory=directory, sources=sources)
+    return PSDStore(directory)
+
+
+def open_store(directory=store_directory):
+    """
+    Opening the store, which is built first if it does not exist or if a
+    source file has been added, removed or changed since it was built.
+    """
+    index_file = os.path.join(directory, 'index.json')
+    if os.path.exists(index_file):
+        with open(index_file, encoding='utf-8') as file:
+            stored = json.load(file)['sources']
+        current = {path: os.stat(path).st_mtime for path in source_files()}
+        if stored == current:
+            return PSDStore(directory)
+    return build_store(directory)
+
+
+class PSDStore:
+    def __init__(self, directory=store_directory):
+        """
+        Opening a store written by write_store. The columns are memory-
+        mapped, so only the spectra which are used are read from disk.
+        :param directory: [str] directory of the store
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json'),
+                  encoding='utf-8') as file:
+            self.index = {entry['name']: entry
+                          for entry in json.load(file)['spectra']}
+        self.columns = {column: np.load(os.path.join(directory,
+                                                     column + '.npy'),
+                                        mmap_mode='r')
+                        for column in columns}
+
+    @property
+    def names(self):
+        return list(self.index)
+
+    def metadata(self, name):
+        return self.index[name]
+
+    def select(self, **metadata):
+        """
+        Names of the spectra matching all the given metadata, in the order
+        they are stored, e.g. select(dataset='crcns').
+        """
+        return [name for name, entry in self.index.items()
+                if all(entry.get(key) == value
+                       for key, value in metadata.items())]
+
+    def load(self, names=None, log=False, crop=True, **metadata):
+        """
+        Loading a subset of the spectra in one call.
+
+        :param names: [sequence or None] names of the spectra, None loads
+                      all spectra matching metadata (see select)
+        :param log: [bool] return log10 of the frequencies and PSDs
+        :param crop: [bool] only return the frequencies inside the crop
+                     range of each spectrum
+
+        :return: spectra: [dict] (f, psd) of each spectrum by name, as read-
+                          only views of the memory-mapped columns
+        """
+        if names is None:
+            names = self.select(**metadata)
+        f_column = self.columns['log_f' if log else 'f']
+        psd_column = self.columns['log_psd' if log else 'psd']
+        spectra = {}
+        for name in names:
+            entry = self.index[name]
+            if crop:
+                start, stop = entry['crop_start'], entry['crop_stop']
+            else:
+                start, stop = entry['start'], entry['stop']
+            spectra[name] = f_column[start:stop], psd_column[start:stop]
+        return spectra
+
+    def load_binned(self, names=None, n_bins=300, log=True, crop=True,
+                    **metadata):
+        """
+        Loading a subset of the spectra in one call, reduced to n_bins
+        log-spaced frequency bins (see spectral.log_bin). Spectra with no more
+        frequencies than n_bins are returned as they are.
+
+        :return: spectra: [dict] (f, mean, min, max) of each binned spectrum
+                          and (f, psd) of the others, by name, as log10
+                          values if log is True
+        """
+        spectra = self.load(names, log=False, crop=crop, **metadata)
+        for name, (f, psd) in spectra.items():
+            if len(f) > n_bins:
+                spectra[name] = log_bin(f, psd, n_bins=n_bins)
+            if log:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    spectra[name] = tuple(np.log10(values)
+                                          for values in spectra[name])
+        return spectra
+
+
+if __name__ == '__main__':
+    store = build_store()
+    for name in store.names:
+        print(name, store.metadata(name)['stop'] -
+              store.metadata(name)['start'])
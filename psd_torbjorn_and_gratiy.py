@@ -1,6 +1,6 @@
-import h5py
 import numpy as np
-from scipy.signal import periodogram
+from lfp_loader import load_lfp
+from spectral import mean_periodogram
 
 # Load LFP data from Gratiy and Torbjørn, calculating mean PSD and saving
 # to file for later.
@@ -10,13 +10,11 @@ def calculate_and_save_psd_of_lfp_gratiy():
     """Loading LFP data, calculating mean PSD and saving to file."""
     # Load data
     file_name = 'Data_LFP_other/mouse_1_lfp_trial_avg_3sec.h5'
-    h5 = h5py.File(file_name, 'r')
-    lfp_off_flash = h5['lfp_off_flash'][...]
+    lfp_off_flash = load_lfp(file_name, 'lfp_off_flash')
     fs = 2500  # sampling rate
-    # Calculate PSD
-    f, pxx = periodogram(lfp_off_flash, fs)
-    # Calculate mean
-    psd_off_mean = np.mean(pxx, axis=0)
+    # Calculate mean PSD
+    f, psd_off_mean = mean_periodogram(lfp_off_flash, fs)
+    lfp_off_flash.close()
     # remove data above 100 Hz
     index = np.where(f <= 100)
     f = f[index]
@@ -28,12 +26,10 @@ def calculate_and_save_psd_of_lfp_gratiy():
 def calculate_and_save_psd_torbjorn():
     """Loading LFP data, calculating mean PSD and saving to file."""
     # Load data
-    lfp = np.load("Data_LFP_other/lfp_run26.npy")[4:-6, :-1]
+    lfp = load_lfp("Data_LFP_other/lfp_run26.npy")[4:-6, :-1]
     samp_rate_lfp = 2000
-    # Calculate PSD
-    f, pxx = periodogram(lfp, samp_rate_lfp)
-    # Calculate mean
-    psd_mean = np.mean(pxx, axis=0)
+    # Calculate mean PSD
+    f, psd_mean = mean_periodogram(lfp, samp_rate_lfp)
     # remove data below 0.1 Hz and above 100 Hz
     index = np.where((f >= 0.1) & (f <= 100))
     f = f[index]
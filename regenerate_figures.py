@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+import runpy
+
+# This file regenerates the figures by running the scripts below one after
+# another without windows (the Agg backend, see rendering.py), and prints the
+# time used by each script. The figures are saved in Figures. The scripts for
+# the diffusion potentials are run first, since they save the PSDs used in
+# the main figures. torbjorn.py and gratiy.py need the raw LFP data, which is
+# not in this repository, so they are only run if asked for, e.g.
+# python regenerate_figures.py torbjorn.py gratiy.py
+
+scripts = ['PSD_of_sine_waves.py', 'diffpot_and_psd.py',
+           'SD_diffpot_and_psd.py', 'comparing_equations_and_scenarios.py',
+           'plot_psd_crcns.py', 'plot_psd_others.py', 'main_psd_plot.py',
+           'main_psd_plot_reduced.py', 'PSDs_chosen.py']
+
+
+def regenerate(script_names):
+    """
+    Running each script as __main__ and returning the time used by each.
+    """
+    os.environ['HEADLESS'] = '1'  # before matplotlib is imported
+    os.makedirs('Figures', exist_ok=True)
+    import matplotlib.pyplot as plt
+
+    times = {}
+    for script in script_names:
+        start = time.perf_counter()
+        runpy.run_path(script, run_name='__main__')
+        plt.close('all')
+        times[script] = time.perf_counter() - start
+        print(f'{script:40s} {times[script]:6.1f} s')
+    print(f'{"total":40s} {sum(times.values()):6.1f} s')
+    return times
+
+
+if __name__ == '__main__':
+    regenerate(sys.argv[1:] or scripts)
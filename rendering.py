@@ -0,0 +1,109 @@
+import os
+import sys
+import contextlib
+import numpy as np
+
+# This file contains the functions used to render the composite PSD figures
+# fast and without a window. With the environment variable HEADLESS=1 the Agg
+# backend is used and show() only closes the figures, so that the scripts can
+# be run in batch jobs (see regenerate_figures.py). Between collect_lines()
+# and draw_lines() (or inside batched_lines()) the lines plotted with
+# plot_line are collected and drawn as a few LineCollections instead of one
+# Line2D each, and dense traces (many points) can be rasterized inside an
+# otherwise vector PDF. matplotlib is only imported when something is plotted.
+
+headless = os.environ.get('HEADLESS', '') not in ('', '0')
+if headless:
+    # MPLBACKEND is read when matplotlib is imported
+    os.environ['MPLBACKEND'] = 'Agg'
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+
+# lines with at least this many points are dense
+dense_points = 2000
+
+_batch = None  # the lines collected by batched_lines, or None
+
+
+def show():
+    """plt.show(), or closing all figures when running headless."""
+    import matplotlib.pyplot as plt
+    if headless:
+        plt.close('all')
+    else:
+        plt.show()
+
+
+def plot_line(x, y, linestyle='-', color=None, linewidth=None, label=None):
+    """
+    Plotting one line like plt.plot(x, y, linestyle, ...), or collecting it
+    after collect_lines(). A collected line gets an empty proxy line for
+    the legend, so the legend is the same as with plt.plot.
+    """
+    import matplotlib.pyplot as plt
+    if _batch is None:
+        plt.plot(x, y, linestyle, color=color, linewidth=linewidth,
+                 label=label)
+        return
+    proxy, = plt.plot([], [], linestyle, color=color, linewidth=linewidth,
+                      label=label)
+    # non-finite points (e.g. log10(0) at f = 0) are left out
+    points = np.column_stack([x, y])
+    points = points[np.all(np.isfinite(points), axis=1)]
+    _batch.append((points, proxy.get_color(), proxy.get_linewidth(),
+                   proxy.get_linestyle()))
+
+
+def collect_lines():
+    """Starting to collect the lines plotted with plot_line."""
+    global _batch
+    _batch = []
+
+
+def draw_lines(rasterize_dense=False, ax=None):
+    """
+    Drawing the lines collected since collect_lines() as LineCollections,
+    one for the dense lines and one for the rest, and stopping collecting.
+
+    :param rasterize_dense: [bool] rasterize the lines with at least
+                            dense_points points (at the dpi of savefig), the
+                            rest of the figure is kept as vector graphics
+    :param ax: [Axes or None] axes to draw on, None uses the current axes
+    """
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    global _batch
+    lines, _batch = _batch or [], None
+    if ax is None:
+        ax = plt.gca()
+
+    groups = {False: [], True: []}
+    for line in lines:
+        dense = rasterize_dense and len(line[0]) >= dense_points
+        groups[dense].append(line)
+    for dense, group in groups.items():
+        if not group:
+            continue
+        points, colors, linewidths, linestyles = zip(*group)
+        collection = LineCollection(points, colors=colors,
+                                    linewidths=linewidths,
+                                    linestyles=linestyles)
+        collection.set_rasterized(dense)
+        ax.add_collection(collection)
+    ax.autoscale_view()
+
+
+@contextlib.contextmanager
+def batched_lines(rasterize_dense=False, ax=None):
+    """
+    The same as collect_lines() before and draw_lines() after a with-block.
+    """
+    collect_lines()
+    try:
+        yield
+    except BaseException:
+        global _batch
+        _batch = None
+        raise
+    draw_lines(rasterize_dense=rasterize_dense, ax=ax)
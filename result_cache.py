@@ -0,0 +1,160 @@
+import os
+import json
+import hashlib
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+# This file contains a cache for the results of
+# DiffusionPotential.calculate_everything. A result is identified by a key
+# made from the concentrations, tau, delta_t, t_end, temperature and the
+# equation used. Recent results are kept in memory (least recently used
+# results are removed first), and every result is also stored on disk in a
+# file named by the key, so that later runs and sweeps can reuse it. Cached
+# arrays are read-only, so that a model updated from the cache can not change
+# the stored result.
+
+# arrays and potentials stored for each result
+result_arrays = ('exp_decay', 'f', 'psd')
+result_potentials = ('goldman', 'henderson', 'delta_phi')
+
+# part of every key, increase it when the equations or the PSD change, so
+# that results calculated before are not used (they are not removed from disk)
+cache_version = 2
+
+
+def make_key(model, equation, analytic_psd=False):
+    """
+    Making the cache key of a DiffusionPotential instance.
+
+    :param model: [DiffusionPotential] the model
+    :param equation: [str] 'goldman', 'henderson' or 'sigma'
+    :param analytic_psd: [bool] whether the PSD is calculated analytically
+
+    :return: key: [str] SHA-256 hex digest of the parameters
+    """
+    if isinstance(model.tau, dict):  # one tau per ion
+        tau = {ion: float(value) for ion, value in model.tau.items()}
+    else:
+        tau = float(model.tau)
+    parameters = {'version': cache_version,
+                  'conc': [[str(name), float(base), float(peak)]
+                           for name, base, peak in zip(
+                               model.ions['name'], model.ions['c_base'],
+                               model.ions['c_peak'])],
+                  'tau': tau,
+                  'delta_t': float(model.delta_t),
+                  't_end': float(model.t_end),
+                  'temp': float(model.T),
+                  'equation': equation,
+                  'analytic_psd': bool(analytic_psd)}
+    if model.conc_trajectory is not None:
+        # the concentration time series are identified by their hashes
+        parameters['conc_trajectory'] = {
+            ion: hashlib.sha256(np.ascontiguousarray(
+                series, dtype=float).tobytes()).hexdigest()
+            for ion, series in model.conc_trajectory.items()}
+    text = json.dumps(parameters, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, maxsize=128, directory='Cache_diffpot'):
+        """
+        :param maxsize: [int] max number of results kept in memory
+        :param directory: [str or None] directory for results on disk,
+                          None keeps results in memory only
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.npz')
+
+    def get(self, key):
+        """Returns the stored result (a dict of read-only arrays), or None."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as data:
+                result = {name: data[name] for name in data.files}
+            self._remember(key, result)
+            self.hits += 1
+            return self.memory[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Storing a result (a dict of arrays) in memory and on disk."""
+        self._remember(key, result)
+        if self.directory is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that other processes never
+        # read a half written file
+        file, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                          suffix='.tmp')
+        with os.fdopen(file, 'wb') as tmp_file:
+            np.savez(tmp_file, **result)
+        os.replace(tmp_path, path)
+
+    def _remember(self, key, result):
+        # read-only copies, also of the arrays of the model which is cached
+        result = {name: np.array(value) for name, value in result.items()}
+        for value in result.values():
+            value.setflags(write=False)
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)  # least recently used
+
+    def clear_memory(self):
+        """Removing all results from memory (files on disk are kept)."""
+        self.memory.clear()
+
+
+default_cache = ResultCache()
+
+
+def calculate_everything_cached(model, goldman=False, henderson=False,
+                                analytic_psd=False, cache=None):
+    """
+    Same as model.calculate_everything(goldman, henderson, analytic_psd), but
+    the result is taken from the cache if it has been calculated before.
+
+    :param model: [DiffusionPotential] the model to update
+    :param cache: [ResultCache or None] cache to use, None uses default_cache
+    """
+    if cache is None:
+        cache = default_cache
+    if goldman:
+        equation = 'goldman'
+    elif henderson:
+        equation = 'henderson'
+    else:
+        equation = 'sigma'
+    key = make_key(model, equation, analytic_psd)
+    result = cache.get(key)
+    if result is None:
+        model.calculate_everything(goldman=goldman, henderson=henderson,
+                                   analytic_psd=analytic_psd)
+        names = result_potentials + result_arrays
+        if analytic_psd:  # the time series is not calculated
+            names = tuple(name for name in names if name != 'exp_decay')
+        result = {name: getattr(model, name) for name in names}
+        cache.put(key, result)
+        return
+
+    model.equation = equation
+    model.analytic_psd = analytic_psd
+    for name in result_potentials:
+        setattr(model, name, float(result[name]))
+    for name in result_arrays:
+        if name in result:
+            setattr(model, name, result[name])
@@ -1,17 +1,175 @@
-# This file contain the functions for scenario 2 and scenario 3
+import numpy as np
+
+# This file contain the functions for scenario 1-4, which give the initial
+# concentrations of K, Na and Cl from a concentration change in K (or Na).
+# scenario1, ..., scenario4 take one change and return a dict
+# {'ion': [base, base+/-change]} as before. scenario1_array, ...,
+# scenario4_array take arrays of changes and baseline concentrations (which
+# are broadcast together) and return all cases at once as one array with
+# shape (cases, ions, 2), where the last axis is [base, base+/-change] and the
+# ions are ordered as in ions. The array can be given directly to
+# DiffusionPotentialBatch.from_tensor. Other ions (e.g. Ca, Mg and HCO3) can
+# be added to the cases with add_ions.
+# Only NumPy is imported here.
+
+ions = ('K', 'Na', 'Cl')
+
+
+def _concentration_tensor(kbase, nabase, delta_k, delta_na, delta_cl):
+    """
+    Making the (cases, ions, 2) array from baseline concentrations and
+    changes of K and Na, and the change of Cl. The arguments are broadcast
+    together and flattened to one axis of cases.
+    """
+    kbase, nabase, delta_k, delta_na, delta_cl = \
+        np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in
+                              (kbase, nabase, delta_k, delta_na, delta_cl)))
+    c = np.empty(shape=(kbase.size, len(ions), 2))
+    c[:, :, 0] = np.stack([kbase.ravel(), nabase.ravel(),
+                           (kbase + nabase).ravel()], axis=-1)  # clbase
+    c[:, :, 1] = c[:, :, 0] + np.stack([delta_k.ravel(), delta_na.ravel(),
+                                        delta_cl.ravel()], axis=-1)
+    return c
+
+
+def as_dict(c):
+    """
+    Converts one case of a (cases, ions, 2) array (or a (ions, 2) array) to a
+    dict {'ion': [base, base+/-change]}.
+    """
+    c = np.asarray(c)
+    if c.ndim == 3:
+        c = c[0]
+    return {ion: c[index].tolist() for index, ion in enumerate(ions)}
+
+
+def add_ions(c, base, change=None, c_ions=ions):
+    """
+    Adding ions to the cases of a (cases, ions, 2) array, e.g.
+    add_ions(scenario1_array(k=k), base={'Ca': 1.2, 'Mg': 1.0, 'HCO3': 26})
+
+    :param c: [array] concentrations, shape (cases, ions, 2)
+    :param base: [dict] baseline concentration(s) of each new ion, a float
+                 or an array with one value per case
+    :param change: [dict or None] concentration change(s) of the new ions,
+                   the ions not in change are constant
+    :param c_ions: [sequence] the ions of c
+
+    :return: c: [array] concentrations, shape (cases, ions + new ions, 2)
+             all_ions: [tuple] the ions of the new array, to be given to
+                       DiffusionPotentialBatch.from_tensor
+    """
+    c = np.asarray(c, dtype=float)
+    change = {} if change is None else change
+    new = np.empty(shape=(len(c), len(base), 2))
+    for column, (ion, ion_base) in enumerate(base.items()):
+        new[:, column, 0] = ion_base
+        new[:, column, 1] = new[:, column, 0] + change.get(ion, 0.0)
+    return np.concatenate([c, new], axis=1), tuple(c_ions) + tuple(base)
+
+
+def scenario1_array(k=0.0, na=0.0, kbase=3.0, nabase=147.0):
+    """
+    Scenario 1 (delta_K + delta_Na = delta_Cl) for arrays of changes. As in
+    scenario1, a case with only a change in K (na = 0) gets delta_Na = -k,
+    and a case with only a change in Na (k = 0) gets delta_K = na.
+
+    :param k: [float or array] concentration change(s) in K
+    :param na: [float or array] concentration change(s) in Na
+    :param kbase: [float or array] baseline concentration(s) for K
+    :param nabase: [float or array] baseline concentration(s) for Na
+
+    :return: c: [array] concentrations, shape (cases, ions, 2)
+    """
+    k = np.asarray(k, dtype=float)
+    na = np.asarray(na, dtype=float)
+    delta_k = np.where(k != 0, k, na)
+    delta_na = np.where(na != 0, na, k)
+    return _concentration_tensor(kbase, nabase, delta_k, -delta_na,
+                                 delta_k - delta_na)
+
+
+def scenario2_array(k, kbase=3.0, nabase=149.0):
+    """
+    Scenario 2 (delta_Na = -delta_K/2, delta_Cl = delta_K/2) for arrays of
+    changes, see scenario1_array.
+    """
+    k = np.asarray(k, dtype=float)
+    return _concentration_tensor(kbase, nabase, k, -0.5 * k, 0.5 * k)
+
+
+def scenario3_array(k, kbase=3.0, nabase=149.0):
+    """
+    Scenario 3 (delta_Na = 0, delta_Cl = delta_K) for arrays of changes, see
+    scenario1_array.
+    """
+    k = np.asarray(k, dtype=float)
+    return _concentration_tensor(kbase, nabase, k, 0.0, k)
+
+
+def scenario4_array(k=0.0, na=0.0, kbase=3.0, nabase=146.0):
+    """
+    Scenario 4 (2*delta_K = -delta_Na and delta_K = -delta_Cl) for arrays of
+    changes, see scenario1_array. As in scenario4, k is used where it is
+    not 0, else delta_K = na/2.
+    """
+    k = np.asarray(k, dtype=float)
+    na = np.asarray(na, dtype=float)
+    delta_k = np.where(k != 0, k, 0.5 * na)
+    return _concentration_tensor(kbase, nabase, delta_k, -2 * delta_k,
+                                 -delta_k)
+
+
+def scenario1(k=None, na=None, kbase=3.0, nabase=147.0):
+    """
+    Using scenario 1 to calculate initial concentration difference for K, Na
+    and Cl.
+
+    :param k: [int or float] concentration change in K
+    :param na: [int or float] concentration change in Na
+    :param kbase: [int or float] baseline concentration for K
+    :param nabase: [int or float] baseline concentration for Na
+
+    :return: init_c: [dict] dictionary with K, Na and Cl as keys and
+                            structured as: {'ion': [base, base+/-change]}
+    """
+    if not k and not na:
+        return None
+    return as_dict(scenario1_array(k=k or 0.0, na=na or 0.0, kbase=kbase,
+                                   nabase=nabase))
 
 
 def scenario2(k, kbase=3.0, nabase=149.0):
-    clbase = kbase + nabase
-    init_c = {'K': [kbase, kbase + k],
-              'Na': [nabase, nabase - 0.5 * k],
-              'Cl': [clbase, clbase + 0.5 * k]}
-    return init_c
+    return as_dict(scenario2_array(k, kbase=kbase, nabase=nabase))
 
 
 def scenario3(k, kbase=3.0, nabase=149.0):
-    clbase = kbase + nabase
-    init_c = {'K': [kbase, kbase + k],
-              'Na': [nabase, nabase],
-              'Cl': [clbase, clbase + k]}
-    return init_c
+    return as_dict(scenario3_array(k, kbase=kbase, nabase=nabase))
+
+
+def scenario4(k=None, na=None, kbase=3.0, nabase=146.0):
+    """
+    Using scenario 4 to calculate initial concentration difference for K, Na
+    and Cl.
+
+    :param k: [int or float] concentration change in K
+    :param na: [int or float] concentration change in Na
+    :param kbase: [int or float] baseline concentration for K
+    :param nabase: [int or float] baseline concentration for Na
+
+    :return: init_c: [dict] dictionary with K, Na and Cl as keys and
+                            structured as: {'ion': [base, base+/-change]}
+    """
+    if not k and not na:
+        return None
+    return as_dict(scenario4_array(k=k or 0.0, na=na or 0.0, kbase=kbase,
+                                   nabase=nabase))
+
+
+# the scenarios by name
+scenario_functions = {'scenario1': scenario1, 'scenario2': scenario2,
+                      'scenario3': scenario3, 'scenario4': scenario4}
+scenario_arrays = {'scenario1': scenario1_array,
+                   'scenario2': scenario2_array,
+                   'scenario3': scenario3_array,
+                   'scenario4': scenario4_array}
@@ -0,0 +1,195 @@
+import numpy as np
+
+# This file fits straight lines log10(PSD) = intercept + slope*log10(f) to
+# many spectra at once. The sums of the least squares solution are calculated
+# for all spectra with a few array operations, so there is no loop over
+# spectra. Points outside the frequency band and points where log10 is not
+# finite (f = 0 or PSD <= 0) are left out of the fit of each spectrum.
+# Confidence intervals for the slopes are found by bootstrapping, where the
+# points of all bootstrap samples of all spectra are drawn with one call and
+# fitted at once in the same way, in blocks of samples to limit the memory.
+
+# fields of the table returned by slope_table
+slope_dtype = [('name', 'U64'), ('slope', float), ('intercept', float),
+               ('slope_low', float), ('slope_high', float),
+               ('n_points', int), ('f_min', float), ('f_max', float)]
+
+
+def _line_fit(n, sx, sy, sxx, sxy):
+    """
+    Slope and intercept of the least squares line from the sums of 1, x, y,
+    x^2 and xy. x and y should be centred (mean close to 0) to avoid
+    cancellation in the sums. Less than two different x give nan.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        return slope, (sy - slope * sx) / n
+
+
+def _centred(log_f, log_psd, mask):
+    """
+    x and y of the fits with shape (spectra, points): masked points are set
+    to 0 (so that inf and nan do not spread) and the mean of the points in
+    the mask is subtracted. Returns x, y and the means.
+    """
+    log_f, log_psd = np.broadcast_arrays(np.asarray(log_f, dtype=float),
+                                         np.asarray(log_psd, dtype=float))
+    log_f, log_psd, mask = (np.atleast_2d(values)
+                            for values in (log_f, log_psd, mask))
+    n = np.maximum(mask.sum(axis=-1, keepdims=True), 1)
+    mean_x = np.sum(log_f, axis=-1, where=mask, keepdims=True) / n
+    mean_y = np.sum(log_psd, axis=-1, where=mask, keepdims=True) / n
+    x = np.where(mask, log_f - mean_x, 0)
+    y = np.where(mask, log_psd - mean_y, 0)
+    return x, y, mean_x[:, 0], mean_y[:, 0]
+
+
+def fit_mask(log_f, log_psd, band=(None, None)):
+    """
+    The points used in the fits: finite values inside band (min, max
+    frequency in Hz, None for no limit). Shape broadcast(log_f, log_psd).
+    """
+    mask = np.isfinite(log_f) & np.isfinite(log_psd)
+    low, high = band
+    if low is not None:
+        mask &= log_f >= np.log10(low)
+    if high is not None:
+        mask &= log_f <= np.log10(high)
+    return mask
+
+
+def fit_slopes(log_f, log_psd, mask=None):
+    """
+    Least squares fit of a line to each spectrum (row) at once, from the sums
+    of 1, x, y, x^2 and xy over the points in the mask.
+
+    :param log_f: [array] log10 of the frequencies, shape (points,) shared by
+                  all spectra, or (spectra, points)
+    :param log_psd: [array] log10 of the PSDs, shape (spectra, points)
+    :param mask: [array or None] points used in the fits, see fit_mask. None
+                 uses all finite points
+
+    :return: slope: [array] slope of each spectrum (a float for one
+                    spectrum with shape (points,))
+             intercept: [array] intercept of each spectrum
+    """
+    if mask is None:
+        mask = fit_mask(log_f, log_psd)
+    x, y, mean_x, mean_y = _centred(log_f, log_psd, mask)
+    mask = np.broadcast_to(mask, x.shape)
+    slope, intercept = _line_fit(mask.sum(axis=-1), x.sum(axis=-1),
+                                 y.sum(axis=-1), np.sum(x * x, axis=-1),
+                                 np.sum(x * y, axis=-1))
+    intercept += mean_y - slope * mean_x
+    if np.ndim(log_f) == np.ndim(log_psd) == 1:  # one spectrum
+        return slope[0], intercept[0]
+    return slope, intercept
+
+
+def bootstrap_slopes(log_f, log_psd, mask=None, n_boot=1000, ci=95,
+                     seed=None, max_block_size=2**24):
+    """
+    Bootstrap confidence intervals of the slopes from fit_slopes. For every
+    spectrum, n_boot samples of its points (drawn with replacement) are
+    fitted. All spectra and a block of bootstrap samples are fitted at once.
+
+    :param n_boot: [int] number of bootstrap samples
+    :param ci: [float] confidence level in percent
+    :param seed: [int or None] seed of the random numbers
+    :param max_block_size: [int] max number of points drawn in a block of
+                           bootstrap samples (limits the memory)
+
+    :return: low: [array] lower limit of the slope of each spectrum
+             high: [array] upper limit of the slope of each spectrum
+    """
+    if mask is None:
+        mask = fit_mask(log_f, log_psd)
+    x, y, _, _ = _centred(log_f, log_psd, mask)
+    mask = np.broadcast_to(mask, x.shape)
+    n_points = mask.sum(axis=-1)
+    # the points of all spectra one after another, without padding
+    x = x[mask]
+    y = y[mask]
+    spectrum = np.repeat(np.arange(len(n_points)), n_points)
+    starts = np.cumsum(n_points) - n_points
+    fitted = n_points > 0
+
+    rng = np.random.default_rng(seed)
+    block = max(1, max_block_size // max(len(x), 1))
+    slopes = np.full((n_boot, len(n_points)), np.nan)
+    for start in range(0, n_boot, block):
+        stop = min(start + block, n_boot)
+        # n_points draws with replacement from the points of each spectrum,
+        # for each bootstrap sample in the block
+        draws = rng.integers(0, n_points[spectrum],
+                             size=(stop - start, len(x)))
+        draws += starts[spectrum]
+        x_drawn = x[draws]
+        y_drawn = y[draws]
+        sums = (np.add.reduceat(values, starts[fitted], axis=-1)
+                for values in (x_drawn, y_drawn, x_drawn * x_drawn,
+                               x_drawn * y_drawn))
+        slopes[start:stop, fitted] = _line_fit(n_points[fitted], *sums)[0]
+    # spectra without points get nan, and so do bootstrap samples which
+    # only drew one frequency (left out of the percentiles)
+    low = np.full(len(n_points), np.nan)
+    high = np.full(len(n_points), np.nan)
+    low[fitted], high[fitted] = np.nanpercentile(
+        slopes[:, fitted], [(100 - ci) / 2, (100 + ci) / 2], axis=0)
+    return low, high
+
+
+def slope_table(spectra, band=(None, None), n_boot=1000, ci=95, seed=None):
+    """
+    Fitting the slopes of spectra with different frequency arrays, e.g. from
+    the PSD store (psd_store.py), at once. The spectra are padded to the
+    same length, and the padding is masked out.
+
+    :param spectra: [dict] (f, psd) of each spectrum by name, not log10
+    :param band: [tuple] (min, max) frequency of the fits in Hz, None for no
+                 limit
+    :param n_boot: [int] number of bootstrap samples, 0 for no intervals
+    :param ci: [float] confidence level of the intervals in percent
+    :param seed: [int or None] seed of the random numbers
+
+    :return: table: [structured array] one row per spectrum, see
+                    slope_dtype
+    """
+    names = list(spectra)
+    n_max = max(len(spectra[name][0]) for name in names)
+    log_f = np.full((len(names), n_max), np.nan)
+    log_psd = np.full((len(names), n_max), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for row, name in enumerate(names):
+            f, psd = spectra[name][:2]
+            log_f[row, :len(f)] = np.log10(f)
+            log_psd[row, :len(psd)] = np.log10(psd)
+    mask = fit_mask(log_f, log_psd, band)
+
+    table = np.zeros(len(names), dtype=slope_dtype)
+    table['name'] = names
+    table['slope'], table['intercept'] = fit_slopes(log_f, log_psd, mask)
+    table['n_points'] = mask.sum(axis=-1)
+    fitted = table['n_points'] > 0
+    table['f_min'] = table['f_max'] = np.nan
+    table['f_min'][fitted] = 10 ** np.min(log_f[fitted], axis=-1,
+                                          where=mask[fitted], initial=np.inf)
+    table['f_max'][fitted] = 10 ** np.max(log_f[fitted], axis=-1,
+                                          where=mask[fitted], initial=-np.inf)
+    if n_boot > 0:
+        table['slope_low'], table['slope_high'] = bootstrap_slopes(
+            log_f, log_psd, mask, n_boot=n_boot, ci=ci, seed=seed)
+    else:
+        table['slope_low'] = table['slope_high'] = np.nan
+    return table
+
+
+def print_table(table):
+    """Printing a table from slope_table."""
+    print(f'{"name":28s} {"slope":>8s} {"CI":>19s} {"intercept":>10s} '
+          f'{"points":>7s} {"f [Hz]":>17s}')
+    for row in table:
+        print(f'{row["name"]:28s} {row["slope"]:8.3f} '
+              f'[{row["slope_low"]:7.3f}, {row["slope_high"]:7.3f}] '
+              f'{row["intercept"]:10.3f} {row["n_points"]:7d} '
+              f'{row["f_min"]:7.2f} - {row["f_max"]:7.2f}')
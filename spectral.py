@@ -0,0 +1,249 @@
+import time
+import numpy as np
+
+# This file contains the functions used to calculate PSDs. All of them use
+# real FFTs, so only the one-sided spectrum is calculated. There are three
+# backends: SciPy's signal.periodogram ('periodogram'), NumPy's rfft
+# ('numpy') and scipy.fft's rfft with several threads ('scipy'). The backend
+# is chosen from the shape of the data if it is not given. Run the file to
+# compare the backends for data shaped like the LFP data from Torbjørn and
+# Gratiy. log_bin reduces a spectrum to log-spaced frequency bins (mean and
+# min/max envelope), for plotting and storing long spectra.
+# SciPy is only imported when a SciPy backend (or padding) is used, so that
+# importing this file (e.g. in the workers of sweep.py) is fast.
+
+backends = ('periodogram', 'numpy', 'scipy')
+
+# data with at least this many values use scipy.fft with threads
+threaded_size = 2**20
+
+# values per block of channels in mean_periodogram, so that the copy of the
+# block and its spectrum stay small (8 MB each in double precision)
+block_size = 2**20
+
+# approximate shapes (channels, time points) of the LFP data, used by the
+# benchmark: Torbjørn's data (2000 Hz, after removing channels at the ends)
+# and Gratiy's trial averaged data (3 s at 2500 Hz)
+benchmark_shapes = {'Torbjorn (2000 Hz)': ((22, 2000 * 300), 2000),
+                    'Gratiy (2500 Hz)': ((80, 2500 * 3), 2500)}
+
+
+def choose_backend(shape):
+    """
+    Choosing a backend from the shape of the data. Large data use scipy.fft
+    with threads, smaller data NumPy's rfft (no thread overhead).
+    """
+    if np.prod(shape) >= threaded_size:
+        return 'scipy'
+    return 'numpy'
+
+
+def _rfft(x, backend, workers, n):
+    if backend == 'scipy':
+        from scipy import fft as sp_fft
+        return sp_fft.rfft(x, n=n, axis=-1, workers=workers)
+    return np.fft.rfft(x, n=n, axis=-1)
+
+
+def _one_sided_power(x, backend, workers, nfft):
+    """|X|^2 of the real FFT of x, squared in place."""
+    spectrum = _rfft(x, backend, workers, nfft)
+    np.square(spectrum.real, out=spectrum.real)
+    np.square(spectrum.imag, out=spectrum.imag)
+    return spectrum.real + spectrum.imag
+
+
+def _double_one_sided(psd, nfft):
+    # one-sided spectrum, the DC and Nyquist frequencies are not doubled
+    if nfft % 2 == 0:
+        psd[..., 1:-1] *= 2
+    else:
+        psd[..., 1:] *= 2
+
+
+def periodogram(x, fs, backend=None, workers=-1, pad=False):
+    """
+    PSD along the last axis, the same as scipy.signal.periodogram(x, fs)
+    (constant detrending, boxcar window, 'density' scaling, one-sided).
+
+    :param x: [array] data, e.g. channel x time
+    :param fs: [float] sampling frequency
+    :param backend: [str or None] 'periodogram', 'numpy' or 'scipy', None
+                    chooses from the shape of x
+    :param workers: [int] threads used by the 'scipy' backend, -1 uses all
+    :param pad: [bool] zero-pad to a fast FFT length (gives a finer
+                frequency grid than the unpadded periodogram)
+
+    :return: f: [array] sample frequencies
+             psd: [array] PSD
+    """
+    x = np.asarray(x)
+    n_points = x.shape[-1]
+    nfft = n_points
+    if pad:
+        from scipy import fft as sp_fft
+        nfft = sp_fft.next_fast_len(n_points, real=True)
+    if backend is None:
+        backend = choose_backend(x.shape)
+    if backend == 'periodogram':
+        from scipy import signal
+        return signal.periodogram(x, fs, nfft=nfft)
+    if backend not in backends:
+        raise ValueError(f'unknown backend: {backend}')
+
+    detrended = x - np.mean(x, axis=-1, keepdims=True)
+    psd = _one_sided_power(detrended, backend, workers, nfft)
+    psd /= fs * n_points
+    _double_one_sided(psd, nfft)
+    return np.fft.rfftfreq(nfft, 1 / fs), psd
+
+
+def mean_periodogram(data, fs, backend=None, workers=-1, float32=False,
+                     channels_per_block=None):
+    """
+    Mean periodogram over all channels (rows), the same as the mean of
+    periodogram(row, fs) for each row. The spectra of a block of channels
+    are calculated with one real FFT call and added to a running sum, so
+    the periodograms of all channels are never stored.
+
+    :param data: [array or LazyLFP] data, channel x time
+    :param fs: [float] sampling frequency
+    :param backend: [str or None] 'numpy' or 'scipy', None chooses from the
+                    shape of data
+    :param workers: [int] threads used by the 'scipy' backend, -1 uses all
+    :param float32: [bool] calculate the FFT in single precision, which
+                    halves the memory used
+    :param channels_per_block: [int or None] channels per FFT call, None
+                               uses as many channels as fit in block_size
+                               values (at least one)
+
+    :return: f: [array] sample frequencies
+             mean_psd: [array] mean PSD
+    """
+    n_channels, n_points = data.shape
+    if channels_per_block is None:
+        channels_per_block = max(1, block_size // n_points)
+    if backend is None:
+        backend = choose_backend(data.shape)
+    dtype = np.float32 if float32 else np.float64
+
+    psd_sum = np.zeros(n_points // 2 + 1)
+    for start in range(0, n_channels, channels_per_block):
+        block = np.asarray(data[start:start + channels_per_block, :])
+        # detrend='constant', with only one copy of the block: data already
+        # in the right precision is not converted first (and not changed)
+        if block.dtype == dtype:
+            block = block - np.mean(block, axis=-1, keepdims=True)
+        else:
+            block = block.astype(dtype)
+            block -= np.mean(block, axis=-1, keepdims=True)
+        power = _one_sided_power(block, backend, workers, n_points)
+        del block
+        psd_sum += np.sum(power, axis=0, dtype=np.float64)
+        del power
+
+    mean_psd = psd_sum / (fs * n_points * n_channels)
+    _double_one_sided(mean_psd, n_points)
+    return np.fft.rfftfreq(n_points, 1 / fs), mean_psd
+
+
+def psd_formula(x, fs, backend=None, workers=-1):
+    """
+    PSD with the formula PSD = 2*|FFT/N|^2/df for the positive frequencies
+    f < fs/2 (the first N//2 frequencies), without detrending, as used to
+    check the periodogram in torbjorn.py and gratiy.py.
+
+    :param backend: [str or None] 'numpy' or 'scipy', None chooses from
+                    the shape of x
+
+    :return: freq: [array] positive sample frequencies
+             psd: [array] PSD
+    """
+    x = np.asarray(x)
+    n_points = x.shape[-1]
+    if backend is None:
+        backend = choose_backend(x.shape)
+    df = fs / n_points  # delta f
+    power = _one_sided_power(x, backend, workers, n_points)
+    ps = 2 * power[..., :n_points // 2] / n_points**2  # power spectrum
+    freq = np.fft.rfftfreq(n_points, 1 / fs)[:n_points // 2]
+    return freq, ps / df
+
+
+def log_bin(f, psd, n_bins=300, f_min=None, f_max=None):
+    """
+    Reducing a spectrum to (at most) n_bins log-spaced frequency bins. Each
+    bin keeps the mean PSD and the min/max envelope of the frequencies in
+    it, and bins without frequencies are left out. At high frequencies, where
+    most of the periodogram frequencies are on a log axis, a bin holds many
+    frequencies, while at low frequencies there is one frequency per bin.
+
+    :param f: [array] sample frequencies, increasing
+    :param psd: [array] PSD along the last axis, e.g. channel x f
+    :param n_bins: [int] number of bins
+    :param f_min: [float or None] lowest frequency, None uses the lowest
+                  frequency above 0 (f = 0 has no place on a log axis)
+    :param f_max: [float or None] highest frequency, None uses the highest
+
+    :return: f_bin: [array] geometric mean frequency of each bin
+             mean: [array] mean PSD in each bin
+             low: [array] min PSD in each bin
+             high: [array] max PSD in each bin
+    """
+    f = np.asarray(f, dtype=float)
+    psd = np.asarray(psd)
+    if f_min is None:
+        f_min = f[f > 0].min()
+    if f_max is None:
+        f_max = f.max()
+    keep = (f >= f_min) & (f <= f_max)
+    f = f[keep]
+    psd = psd[..., keep]
+
+    edges = np.logspace(np.log10(f_min), np.log10(f_max), n_bins + 1)
+    bins = np.minimum(np.searchsorted(edges, f, side='right') - 1,
+                      n_bins - 1)
+    # the frequencies are sorted, so each bin is a run of frequencies
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    counts = np.diff(np.append(starts, len(f)))
+    f_bin = 10 ** (np.add.reduceat(np.log10(f), starts) / counts)
+    mean = np.add.reduceat(psd, starts, axis=-1) / counts
+    low = np.minimum.reduceat(psd, starts, axis=-1)
+    high = np.maximum.reduceat(psd, starts, axis=-1)
+    return f_bin, mean, low, high
+
+
+def benchmark(repeat=3, seed=0):
+    """
+    Timing the backends of periodogram (and mean_periodogram) for random
+    data with the shapes in benchmark_shapes. Prints a table and returns the
+    best time of each case in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    times = {}
+    for name, (shape, fs) in benchmark_shapes.items():
+        data = rng.standard_normal(shape)
+        cases = {f'periodogram, {backend}':
+                 (lambda b=backend: periodogram(data, fs, backend=b))
+                 for backend in backends}
+        cases['periodogram, scipy, padded'] = \
+            lambda: periodogram(data, fs, backend='scipy', pad=True)
+        cases['mean_periodogram, scipy'] = \
+            lambda: mean_periodogram(data, fs, backend='scipy')
+        cases['mean_periodogram, scipy, float32'] = \
+            lambda: mean_periodogram(data, fs, backend='scipy', float32=True)
+        print(f'{name}, shape {shape}, auto backend: '
+              f'{choose_backend(shape)}')
+        for case, function in cases.items():
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                function()
+                best = min(best, time.perf_counter() - start)
+            times[(name, case)] = best
+            print(f'    {case:35s} {best * 1000:10.1f} ms')
+    return times
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,180 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from diffusionpotential import DiffusionPotential, shared_grids
+from result_cache import ResultCache, calculate_everything_cached
+from scenario import scenario_functions
+
+# This file runs parameter sweeps over scenarios, concentration changes of K+,
+# baseline concentrations, time constants, temperatures and choice of
+# equation. Each case gets its own DiffusionPotential instance, and the cases
+# are sent in chunks to a pool of worker processes. The potentials of all
+# cases are collected in one structured array (a table), and the PSDs in one
+# array, both stored in a SweepResult which can be saved to file.
+
+equations = ('goldman', 'henderson', 'sigma')
+
+# fields of the table, input parameters followed by the calculated potentials
+grid_dtype = [('scenario', 'U16'), ('k', float), ('kbase', float),
+              ('nabase', float), ('tau', float), ('temp', float),
+              ('equation', 'U16')]
+result_dtype = grid_dtype + [('goldman', float), ('henderson', float),
+                             ('delta_phi', float)]
+
+
+def make_grid(scenarios=('scenario1',), k=(4.0,), kbase=(3.0,),
+              nabase=(149.0,), tau=(5.0,), temp=(310.0,),
+              equation=('henderson',)):
+    """
+    Making a grid with every combination of the given parameters.
+
+    :param scenarios: [sequence] names of scenarios, see scenario_functions
+    :param k: [sequence] concentration changes in K
+    :param kbase: [sequence] baseline concentrations for K
+    :param nabase: [sequence] baseline concentrations for Na
+    :param tau: [sequence] time constants
+    :param temp: [sequence] temperatures, K
+    :param equation: [sequence] 'goldman', 'henderson' or 'sigma', the
+                     equation used for the initial potential of the decay
+
+    :return: grid: [structured array] one row per case
+    """
+    for name in scenarios:
+        if name not in scenario_functions:
+            raise ValueError(f'unknown scenario: {name}')
+    for name in equation:
+        if name not in equations:
+            raise ValueError(f'unknown equation: {name}')
+    cases = list(itertools.product(scenarios, k, kbase, nabase, tau, temp,
+                                   equation))
+    return np.array(cases, dtype=grid_dtype)
+
+
+def _run_chunk(chunk, delta_t, t_end, analytic_psd, keep_psd,
+               cache_directory):
+    """Calculating potentials (and PSDs) for one chunk of the grid."""
+    cache = None
+    if cache_directory is not None:
+        cache = ResultCache(maxsize=len(chunk), directory=cache_directory)
+    potentials = np.zeros(shape=(len(chunk), 3))
+    psd = []
+    for index, case in enumerate(chunk):
+        scen = scenario_functions[str(case['scenario'])]
+        c = scen(k=float(case['k']), kbase=float(case['kbase']),
+                 nabase=float(case['nabase']))
+        model = DiffusionPotential(conc=c, tau=float(case['tau']),
+                                   delta_t=delta_t, t_end=t_end,
+                                   name=str(case['scenario']),
+                                   temp=float(case['temp']))
+        goldman = case['equation'] == 'goldman'
+        henderson = case['equation'] == 'henderson'
+        if cache is None:
+            model.calculate_everything(goldman=goldman, henderson=henderson,
+                                       analytic_psd=analytic_psd)
+        else:
+            calculate_everything_cached(model, goldman=goldman,
+                                        henderson=henderson,
+                                        analytic_psd=analytic_psd,
+                                        cache=cache)
+        potentials[index] = model.goldman, model.henderson, model.delta_phi
+        if keep_psd:
+            psd.append(model.psd)
+    # the next chunks may have other tau, so the unit decays are not kept
+    shared_grids.clear()
+    return potentials, (np.array(psd) if keep_psd else None), model.f
+
+
+def run_sweep(grid, delta_t=0.01, t_end=100, processes=None, chunksize=64,
+              analytic_psd=False, keep_psd=True, cache_directory=None):
+    """
+    Running every case in the grid with a pool of worker processes.
+
+    :param grid: [structured array] cases, see make_grid
+    :param delta_t: [float] time step
+    :param t_end: [float] end time of the decay
+    :param processes: [int or None] number of worker processes, None uses
+                      all cores and 1 runs everything in this process
+    :param chunksize: [int] number of cases sent to a worker at a time
+    :param analytic_psd: [bool] use the closed-form PSD, see
+                         DiffusionPotential.power_spectrum_density
+    :param keep_psd: [bool] collect the PSD of every case
+    :param cache_directory: [str or None] directory of a ResultCache shared
+                            by the workers, None calculates every case
+
+    :return: [SweepResult]
+    """
+    if len(grid) == 0:
+        raise ValueError('the grid has no cases')
+    chunks = [grid[start:start + chunksize]
+              for start in range(0, len(grid), chunksize)]
+    args = (itertools.repeat(delta_t), itertools.repeat(t_end),
+            itertools.repeat(analytic_psd), itertools.repeat(keep_psd),
+            itertools.repeat(cache_directory))
+    if processes == 1:
+        results = list(map(_run_chunk, chunks, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_run_chunk, chunks, *args))
+
+    table = np.zeros(len(grid), dtype=result_dtype)
+    for name in grid.dtype.names:
+        table[name] = grid[name]
+    potentials = np.concatenate([result[0] for result in results])
+    table['goldman'] = potentials[:, 0]
+    table['henderson'] = potentials[:, 1]
+    table['delta_phi'] = potentials[:, 2]
+    psd = np.concatenate([result[1] for result in results]) \
+        if keep_psd else None
+    return SweepResult(table, f=results[0][2], psd=psd)
+
+
+class SweepResult:
+    def __init__(self, table, f=None, psd=None):
+        """
+        The result of a sweep.
+        :param table: [structured array] parameters and potentials of each
+                      case, see result_dtype
+        :param f: [array or None] sample frequencies of the PSDs
+        :param psd: [array or None] PSD of each case, shape (cases, f)
+        """
+        self.table = table
+        self.f = f
+        self.psd = psd
+
+    def select(self, **parameters):
+        """
+        Returns a boolean mask of the cases matching all the given
+        parameters, e.g. select(scenario='scenario2', tau=5).
+        """
+        mask = np.ones(len(self.table), dtype=bool)
+        for name, value in parameters.items():
+            mask &= self.table[name] == value
+        return mask
+
+    def save(self, file_name):
+        """Saving the table (and the PSDs) to a .npz file."""
+        arrays = {'table': self.table}
+        if self.psd is not None:
+            arrays.update(f=self.f, psd=self.psd)
+        np.savez(file_name, **arrays)
+
+    @classmethod
+    def load(cls, file_name):
+        """Loading a SweepResult saved with save."""
+        data = np.load(file_name)
+        f = data['f'] if 'f' in data.files else None
+        psd = data['psd'] if 'psd' in data.files else None
+        return cls(data['table'], f=f, psd=psd)
+
+
+if __name__ == '__main__':
+    # Same tables as in comparing_equations_and_scenarios.py
+    potassium = [2, 4, 6, 9]
+    grid = make_grid(scenarios=tuple(scenario_functions), k=potassium,
+                     nabase=(149.0,), tau=(5,))
+    result = run_sweep(grid, analytic_psd=True)
+    for name in scenario_functions:
+        rows = result.table[result.select(scenario=name)]
+        print(name)
+        print(np.array([rows['k'], rows['goldman'], rows['henderson'],
+                        rows['delta_phi']]))
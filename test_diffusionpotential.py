@@ -0,0 +1,49 @@
+import numpy as np
+from diffusionpotential import DiffusionPotential
+from scenario import scenario1
+
+# This file checks that the quantities of DiffusionPotential are only
+# calculated again when something they depend on changes. Run with pytest.
+
+
+def test_reading_a_potential_keeps_the_trajectory():
+    model = DiffusionPotential(conc=scenario1(k=4),
+                               tau={'K': 3, 'Na': 4, 'Cl': 5},
+                               delta_t=0.01, t_end=10, name='trajectory')
+    model.calculate_everything(henderson=True)
+    trajectory = model.potential_trajectory
+    psd = model.psd
+    model.goldman, model.delta_phi  # calculated when read
+    assert model.potential_trajectory is trajectory
+    assert model.psd is psd
+
+
+def test_reading_a_potential_keeps_values_set():
+    model = DiffusionPotential(conc=scenario1(k=4), tau=5, delta_t=0.01,
+                               t_end=10, name='decay')
+    model.exp_decay = np.ones(3)  # e.g. from a cache
+    model.goldman
+    assert np.array_equal(model.exp_decay, np.ones(3))
+
+
+def test_setting_a_potential_invalidates_the_decay():
+    model = DiffusionPotential(conc=scenario1(k=4), tau=5, delta_t=0.01,
+                               t_end=10, name='decay')
+    model.calculate_everything(henderson=True)
+    model.henderson = 2 * model.henderson
+    assert np.isclose(model.exp_decay[0], abs(model.henderson))
+
+
+def test_decays_share_the_unit_arrays():
+    models = [DiffusionPotential(conc=scenario1(k=k), tau=5, delta_t=0.01,
+                                 t_end=10, name=str(k)) for k in (2, 4)]
+    for model in models:
+        model.calculate_everything(henderson=True)
+        assert np.allclose(model.exp_decay,
+                           model.scale * np.exp(-model.t / 5))
+        model.psd
+        # only the scale is kept per instance, not the scaled arrays
+        assert 'exp_decay' not in model._cache
+        assert 'psd' not in model._cache
+    assert models[0].unit_decay is models[1].unit_decay
+    assert models[0].unit_psd is models[1].unit_psd
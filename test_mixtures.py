@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from diffusionpotential import DiffusionPotential, R, F, lambda_n, \
+    valence, diffcoeff, henderson_potential, mixture_potentials
+from diffusionpotential_batch import DiffusionPotentialBatch
+from result_cache import ResultCache, calculate_everything_cached
+from scenario import scenario1, scenario1_array, add_ions
+
+# This file checks the equations for mixtures with divalent ions (Ca, Mg)
+# against the Henderson equation written out ion by ion, that the Goldman
+# equation can not be chosen for them, and that they can be cached. Run with
+# pytest.
+
+# K, Na and Cl of scenario 1 (4 mM more K) with Ca, Mg and HCO3 added,
+# Ca drops by 0.5 mM
+mixture_base = {'Ca': 1.2, 'Mg': 1.0, 'HCO3': 26}
+mixture_change = {'Ca': -0.5}
+
+
+def henderson_loop(conc, temp=310):
+    """The Henderson equation with a loop over the ions, in mV."""
+    num_sum = denom_sum = num_ln = denom_ln = 0
+    for ion, (base, peak) in conc.items():
+        d = diffcoeff[ion] / lambda_n**2
+        z = valence[ion]
+        num_sum += z * d * (peak - base)
+        denom_sum += z**2 * d * (peak - base)
+        num_ln += z**2 * d * base
+        denom_ln += z**2 * d * peak
+    return (R * temp / F) * (num_sum / denom_sum) * \
+        np.log(num_ln / denom_ln) * 1000
+
+
+def mixture_conc():
+    conc = scenario1(k=4)
+    for ion, base in mixture_base.items():
+        conc[ion] = [base, base + mixture_change.get(ion, 0.0)]
+    return conc
+
+
+def test_henderson_divalent_mixture():
+    conc = mixture_conc()
+    expected = henderson_loop(conc)
+
+    model = DiffusionPotential(conc=conc, tau=5, delta_t=0.01, t_end=10,
+                               name='mixture')
+    assert np.isclose(model.henderson, expected, rtol=1e-10)
+
+    c, ions = add_ions(scenario1_array(k=4), base=mixture_base,
+                       change=mixture_change)
+    goldman, henderson, delta_phi = mixture_potentials(ions, c[:, :, 0],
+                                                       c[:, :, 1])
+    assert np.allclose(henderson, expected, rtol=1e-10)
+    assert np.all(np.isnan(goldman))
+
+    batch = DiffusionPotentialBatch.from_tensor(c, tau=5, delta_t=0.01,
+                                                t_end=10, ions=ions)
+    batch.potentials()
+    assert np.allclose(batch.henderson, expected, rtol=1e-10)
+
+    d = np.array([diffcoeff[ion] for ion in ions]) / lambda_n**2
+    z = np.array([valence[ion] for ion in ions])
+    assert np.allclose(henderson_potential(d, z, c[:, :, 0].T, c[:, :, 1].T),
+                       expected, rtol=1e-10)
+
+
+def test_henderson_monovalent_unchanged():
+    conc = scenario1(k=4)
+    model = DiffusionPotential(conc=conc, tau=5, delta_t=0.01, t_end=10,
+                               name='scenario1')
+    assert np.isclose(model.henderson, henderson_loop(conc), rtol=1e-10)
+
+
+def test_goldman_divalent_mixture_raises():
+    c, ions = add_ions(scenario1_array(k=4), base=mixture_base,
+                       change=mixture_change)
+    batch = DiffusionPotentialBatch.from_tensor(c, tau=5, delta_t=0.01,
+                                                t_end=10, ions=ions)
+    with pytest.raises(ValueError):
+        batch.calculate_everything(goldman=True)
+    model = DiffusionPotential(conc=mixture_conc(), tau=5, delta_t=0.01,
+                               t_end=10, name='mixture')
+    with pytest.raises(ValueError):
+        model.exponential_decay(g=True)
+    with pytest.raises(ValueError):
+        model.calculate_everything(goldman=True)
+
+
+def test_cached_divalent_mixture(tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    expected = henderson_loop(mixture_conc())
+    for hits in (0, 1):
+        model = DiffusionPotential(conc=mixture_conc(), tau=5, delta_t=0.01,
+                                   t_end=10, name='mixture')
+        calculate_everything_cached(model, henderson=True, cache=cache)
+        assert cache.hits == hits
+        assert np.isclose(model.henderson, expected, rtol=1e-10)
+        assert np.isnan(model.goldman)
+        assert np.isclose(model.exp_decay[0], abs(expected), rtol=1e-10)
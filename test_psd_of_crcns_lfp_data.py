@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from scipy.signal import welch
+from psd_of_crcns_lfp_data import welch_psd_streaming
+
+# This file checks the streaming Welch PSD of psd_of_crcns_lfp_data.py
+# against SciPy's welch. Run with pytest.
+
+
+def test_welch_psd_streaming_matches_welch():
+    data = np.random.default_rng(0).normal(size=(3, 5000))
+    f, psd = welch_psd_streaming(data, fs=1250, nperseg=256,
+                                 segments_per_read=3)
+    f_welch, psd_welch = welch(data, fs=1250, nperseg=256)
+    assert np.allclose(f, f_welch)
+    assert np.allclose(psd, np.mean(psd_welch, axis=0))
+
+
+@pytest.mark.parametrize('noverlap', [256, 300])
+def test_welch_psd_streaming_noverlap_too_large(noverlap):
+    data = np.zeros(shape=(2, 1000))
+    with pytest.raises(ValueError):
+        welch_psd_streaming(data, fs=1250, nperseg=256, noverlap=noverlap)
@@ -1,17 +1,23 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.signal import periodogram
+from rendering import show
+from lfp_loader import load_lfp
+from spectral import periodogram, psd_formula
 
 # In this file I calculate the PSD of Torbjørn's LFP data using SciPy's
 # signal.periodogram function, and by using the formula for PSD.
 # The result of both method are plotted in the same figure. The lines
 # overlap which indicate that the two methods give the same result
+# The LFP data is loaded once (memory-mapped) and used by both methods.
 
 
-def psd_with_periodogramn():
+def load_lfp_torbjorn():
+    """Lazy view of the LFP data, without the channels at the ends."""
+    return load_lfp("Data_LFP_other/lfp_run26.npy")[4:-6, :-1]
+
+
+def psd_with_periodogramn(lfp):
     """Calculate and plot mean psd with periodogram function"""
-    # Load data
-    lfp = np.load("Data_LFP_other/lfp_run26.npy")[4:-6, :-1]
     samp_rate_lfp = 2000  # sample rate
     # Calculate psd for each channel
     f, pxx = periodogram(lfp, samp_rate_lfp)
@@ -22,26 +28,11 @@ def psd_with_periodogramn():
              linewidth=0.5, label='periodogram')
 
 
-def psd_with_formula():
+def psd_with_formula(lfp):
     """Calculate and plot mean psd with formula"""
-    # Load data
-    lfp = np.load("Data_LFP_other/lfp_run26.npy")[4:-6, :-1]
-
-    n_points = lfp.shape[1]  # number of points
     samp_rate_lfp = 2000  # sample rate
-    dt = 1 / samp_rate_lfp  # delta t
-    df = samp_rate_lfp/n_points  # delta f
-
-    # Getting the sample frequencies of the Discrete Fourier Transform (DFT)
-    f_dft = np.fft.fftfreq(n_points, d=dt)
-    freq = f_dft[:n_points//2]  # only positive frequencies (one-sided)
-
-    # Compute the DFT of lfp by using the Fast Fourier Transform (FFT)
-    fft = np.abs(np.fft.fft(lfp))/n_points
-    # Power spectrum (PS)
-    ps = 2*(fft[:, :n_points//2]**2)  # only positive frequencies (one-sided)
-    # Power spectrum density (PSD)
-    psd = ps / df
+    # PSD = 2*|FFT/N|^2/df, only positive frequencies (one-sided)
+    freq, psd = psd_formula(lfp, samp_rate_lfp)
     # Computing the mean psd
     psd_mean = np.mean(psd, axis=0)
     # Plotting
@@ -53,10 +44,11 @@ if __name__ == '__main__':
     plt.figure()
     plt.title('PSD of LFP data from Torbjørn')
 
-    psd_with_periodogramn()
-    psd_with_formula()
+    lfp_data = load_lfp_torbjorn()
+    psd_with_periodogramn(lfp_data)
+    psd_with_formula(lfp_data)
 
     plt.xlabel('log$_{10}$(frequency) [Hz]')
     plt.ylabel('log$_{10}$(PSD) [mV$^{2}$/Hz]')
     plt.legend()
-    plt.show()
+    show()